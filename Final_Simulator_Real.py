@@ -4,6 +4,11 @@ import numpy as np
 import sys
 from scipy.optimize import minimize
 import math
+import os
+import hashlib
+import json
+import time
+from collections import OrderedDict, deque
 
 
 # Class to manage the properties and methods related to the equilateral triangle
@@ -32,6 +37,28 @@ class Triangle:
             int(self._height - self._vertical_margin),
         )
 
+        # Edge functions a*z + b*y + c, equal to sign((z, y), va, vb) for each edge
+        edges = (
+            (self._vertex1, self._vertex2),
+            (self._vertex2, self._vertex3),
+            (self._vertex3, self._vertex1),
+        )
+        self._edge_coefficients = np.array(
+            [
+                (
+                    va[1] - vb[1],
+                    vb[0] - va[0],
+                    vb[1] * (va[0] - vb[0]) - vb[0] * (va[1] - vb[1]),
+                )
+                for va, vb in edges
+            ],
+            dtype=float,
+        )
+
+        # Valid circle centre rasters, built once per radius
+        self._rasters = {}
+        self._insets = {}  # Triangles inset by a circle radius, built once per radius
+
     # Helper function to calculate the sign of an area
     def sign(self, p1, p2, p3):
         # This function helps determine the relative position of a point with respect to the triangle's edges
@@ -45,6 +72,15 @@ class Triangle:
         b3 = self.sign((pz, py), v3, v1) < 0.0
         return (b1 == b2) and (b2 == b3)
 
+    # Vectorized point_in_triangle for an (N, 2) array of (z, y) points against this triangle
+    def points_in_triangle(self, points):
+        points = np.asarray(points, dtype=float)
+        values = (
+            points @ self._edge_coefficients[:, :2].T + self._edge_coefficients[:, 2]
+        )
+        negative = values < 0.0
+        return negative.all(axis=-1) | ~negative.any(axis=-1)
+
     # Function to check if a circle is entirely inside the triangle
     def circle_in_triangle(self, cz, cy, rad, v1, v2, v3):
         # Check if all points on the circumference of the circle lie within the triangle
@@ -55,10 +91,322 @@ class Triangle:
                 return False
         return True
 
+    # Exact test: the circle fits if its centre is at least rad from every edge, on the inside
+    def circle_in_triangle_exact(self, cz, cy, rad, v1, v2, v3):
+        cz = np.asarray(cz, dtype=float)
+        cy = np.asarray(cy, dtype=float)
+
+        # Orientation of the vertices, so inside distances come out positive
+        orientation = np.sign(self.sign(v2, v3, v1))
+        inside = np.ones(np.broadcast(cz, cy).shape, dtype=bool)
+        for a, b in ((v1, v2), (v2, v3), (v3, v1)):
+            edge_length = math.hypot(b[0] - a[0], b[1] - a[1])
+            distance = (
+                orientation
+                * ((b[0] - a[0]) * (cy - a[1]) - (b[1] - a[1]) * (cz - a[0]))
+                / edge_length
+            )
+            inside &= distance >= rad
+        return bool(inside) if inside.ndim == 0 else inside
+
+    # Boolean raster of valid circle centres, one cell per pixel (1 mm) over the triangle
+    def valid_centre_raster(self, rad, directory=None):
+        if rad in self._rasters:
+            return self._rasters[rad]
+
+        # Optionally keep the raster on disk, keyed by the geometry it was built for
+        path = None
+        if directory is not None:
+            key = repr(("mm", self._width, self._height, self._side_length, rad))
+            digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+            path = os.path.join(directory, f"triangle_raster_{digest}.npy")
+        if path is not None and os.path.exists(path):
+            raster = np.load(path)
+        else:
+            # One cell per typed (Y, Z) in mm, placed on screen exactly as run_setup places them
+            z = int(self._horizontal_margin) + np.arange(int(self._side_length) + 1)
+            y = (
+                self._height
+                - self._vertical_margin
+                - np.arange(int(self._triangle_height) + 1)
+            )
+            raster = self.circle_in_triangle_exact(
+                z[None, :], y[:, None], rad, self._vertex1, self._vertex2, self._vertex3
+            )
+            if path is not None:
+                os.makedirs(directory, exist_ok=True)
+                np.save(path, raster)
+
+        self._rasters[rad] = raster
+        return raster
+
+    # O(1) check of a circle centre against the precomputed raster
+    def circle_fits(self, cz, cy, rad):
+        raster = self.valid_centre_raster(rad)
+        row = self._height - self._vertical_margin - cy
+        col = cz - int(self._horizontal_margin)
+
+        # Centres off the millimetre grid are tested exactly rather than rounded onto it
+        if abs(row - round(row)) > 1e-9 or abs(col - round(col)) > 1e-9:
+            return bool(
+                self.circle_in_triangle_exact(
+                    cz, cy, rad, self._vertex1, self._vertex2, self._vertex3
+                )
+            )
+        row, col = int(round(row)), int(round(col))
+        return (
+            0 <= row < raster.shape[0]
+            and 0 <= col < raster.shape[1]
+            and bool(raster[row, col])
+        )
+
+    # The triangle inset by rad: every centre inside it leaves the circle inside the triangle
+    def inset_triangle(self, rad):
+        if rad not in self._insets:
+            v1, v2, v3 = (np.asarray(v, dtype=float) for v in self._vertices())
+            a = np.linalg.norm(v2 - v3)
+            b = np.linalg.norm(v3 - v1)
+            c = np.linalg.norm(v1 - v2)
+
+            # Shifting every edge inward by rad shrinks the triangle about its incentre
+            incentre = (a * v1 + b * v2 + c * v3) / (a + b + c)
+            inradius = abs(self.sign(v1, v2, v3)) / (a + b + c)
+            factor = (inradius - rad) / inradius
+            self._insets[rad] = (
+                tuple(
+                    tuple(float(p) for p in incentre + factor * (v - incentre))
+                    for v in (v1, v2, v3)
+                )
+                if factor > 0
+                else None
+            )
+        return self._insets[rad]
+
+    # The valid circle centre nearest to (cz, cy), or None when the circle cannot fit at all
+    def nearest_valid_centre(self, cz, cy, rad):
+        inset = self.inset_triangle(rad)
+        if inset is None:
+            return None
+        if self.point_in_triangle(cz, cy, *inset):
+            return (cz, cy)
+
+        # Outside the inset triangle the nearest valid centre lies on one of its edges
+        point = np.array([cz, cy], dtype=float)
+        best = None
+        for a, b in ((inset[0], inset[1]), (inset[1], inset[2]), (inset[2], inset[0])):
+            a, b = np.asarray(a), np.asarray(b)
+            t = np.clip(np.dot(point - a, b - a) / np.dot(b - a, b - a), 0, 1)
+            candidate = a + t * (b - a)
+            if best is None or np.sum((point - candidate) ** 2) < np.sum(
+                (point - best) ** 2
+            ):
+                best = candidate
+        return (float(best[0]), float(best[1]))
+
+    # The triangle's own vertices
+    def _vertices(self):
+        return self._vertex1, self._vertex2, self._vertex3
+
+
+# Class to hold arbitrary target openings (polygons and circular holes) with a grid spatial index
+class TargetGeometry:
+    def __init__(self, polygons=(), circles=(), cell_size=None):
+        # Polygon rings in board millimetres (z, y), combined with the even-odd rule,
+        # so a ring inside another ring is a cut-out
+        self._polygons = [np.asarray(ring, dtype=float) for ring in polygons]
+        self._circles = np.asarray(circles, dtype=float).reshape(-1, 3)  # (cz, cy, r)
+
+        # The grid needs at least one opening to span, and every opening must be well formed
+        if not self._polygons and not len(self._circles):
+            raise ValueError("TargetGeometry needs at least one polygon or circle")
+        for ring in self._polygons:
+            if ring.ndim != 2 or ring.shape[1] != 2 or len(ring) < 3:
+                raise ValueError(
+                    f"Polygon rings need at least 3 (z, y) points, got shape {ring.shape}"
+                )
+        if np.any(self._circles[:, 2] <= 0):
+            raise ValueError("Circle radii must be positive")
+
+        # Every polygon edge as a segment from (z0, y0) to (z1, y1)
+        if self._polygons:
+            self._edges = np.concatenate(
+                [
+                    np.hstack((ring, np.roll(ring, -1, axis=0)))
+                    for ring in self._polygons
+                ]
+            )
+        else:
+            self._edges = np.empty((0, 4))
+
+        # Uniform grid over the bounding box of every opening
+        corners = [self._edges[:, :2], self._edges[:, 2:]]
+        for cz, cy, r in self._circles:
+            corners.append(np.array([[cz - r, cy - r], [cz + r, cy + r]]))
+        corners = np.concatenate(corners)
+        self._origin = corners.min(axis=0)
+        extent = np.maximum(corners.max(axis=0) - self._origin, 1e-9)
+        if cell_size is None:
+            # About as many cells as edges, so each cell holds a handful
+            cell_size = max(extent) / max(np.sqrt(len(self._edges)), 1)
+        self._cell_size = float(cell_size)
+        self._shape = tuple(int(n) + 1 for n in np.floor(extent / self._cell_size))
+
+        # Bucket each edge into every cell its bounding box overlaps
+        self._cells = [[] for _ in range(self._shape[0] * self._shape[1])]
+        low = self._cell_of(np.minimum(self._edges[:, :2], self._edges[:, 2:]))
+        high = self._cell_of(np.maximum(self._edges[:, :2], self._edges[:, 2:]))
+        for edge, ((i0, j0), (i1, j1)) in enumerate(zip(low, high)):
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    self._cells[i * self._shape[1] + j].append(edge)
+        self._cells = [np.array(cell, dtype=int) for cell in self._cells]
+
+        # Inside/outside state of every cell centre, the reference for containment queries
+        i, j = np.indices(self._shape)
+        centres = (
+            self._origin
+            + (np.stack((i, j), axis=-1).reshape(-1, 2) + 0.5) * self._cell_size
+        )
+        self._centres = centres
+        self._centre_inside = self._crossings(
+            centres, np.full(len(centres), np.inf), self._edges
+        )
+
+    # Build the geometry of an equilateral Triangle in board millimetres (y up from its base)
+    @classmethod
+    def from_triangle(cls, triangle, cell_size=None):
+        base_y = triangle._vertex2[1]
+        left_z = triangle._vertex2[0]
+        ring = [
+            (z - left_z, base_y - y)
+            for z, y in (triangle._vertex1, triangle._vertex2, triangle._vertex3)
+        ]
+        return cls(polygons=[ring], cell_size=cell_size)
+
+    # Load polygons and circular holes from a JSON file
+    @classmethod
+    def load(cls, path, cell_size=None):
+        with open(path) as file:
+            data = json.load(file)
+        if not data.get("polygons") and not data.get("circles"):
+            raise ValueError(f"{path} defines no polygons or circles")
+        return cls(
+            polygons=data.get("polygons", []),
+            circles=data.get("circles", []),
+            cell_size=cell_size,
+        )
+
+    # Grid cell (i, j) of each point, clamped to the grid
+    def _cell_of(self, points):
+        cells = np.floor((points - self._origin) / self._cell_size).astype(int)
+        return np.clip(cells, 0, np.array(self._shape) - 1)
+
+    # Even-odd parity of a horizontal ray test, or of crossings along a short segment
+    def _crossings(self, points, end_z, edges):
+        z, y = points[:, 0:1], points[:, 1:2]
+        z0, y0, z1, y1 = (edges[:, k] for k in range(4))
+
+        # Edges that straddle each point's horizontal line, and where they cross it
+        straddle = (y0 > y) != (y1 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_cross = z0 + (y - y0) * (z1 - z0) / (y1 - y0)
+        low = np.minimum(z, end_z[:, None])
+        high = np.maximum(z, end_z[:, None])
+        hits = straddle & (z_cross > low) & (z_cross <= high)
+        return (hits.sum(axis=1) % 2).astype(bool)
+
+    # Distance from each point to the nearest of the given edges
+    def _edge_distance(self, points, edges):
+        start, end = edges[:, :2], edges[:, 2:]
+        direction = end - start
+        length_sq = np.maximum(np.sum(direction**2, axis=1), 1e-12)
+        offset = points[:, None, :] - start[None, :, :]
+        t = np.clip(np.sum(offset * direction, axis=2) / length_sq, 0, 1)
+        closest = start + t[..., None] * direction
+        return np.sqrt(np.sum((points[:, None, :] - closest) ** 2, axis=2)).min(axis=1)
+
+    # Which points lie inside an opening, from their cell centre plus nearby crossings
+    def contains(self, points):
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        inside = np.zeros(len(points), dtype=bool)
+        if len(self._edges):
+            # Points outside the grid are outside every polygon
+            upper = self._origin + np.array(self._shape) * self._cell_size
+            in_grid = np.all((points >= self._origin) & (points < upper), axis=1)
+            i, j = self._cell_of(points).T
+            flat = np.where(in_grid, i * self._shape[1] + j, -1)
+            for cell in np.unique(flat[in_grid]):
+                members = flat == cell
+                edges = self._edges[self._cells[cell]]
+                state = self._centre_inside[cell]
+                if len(edges):
+                    centre = self._centres[cell]
+                    on_line = np.column_stack(
+                        (np.full(members.sum(), centre[0]), points[members, 1])
+                    )
+                    # Vertical leg from the centre, then horizontal leg to the point
+                    state = (
+                        state
+                        ^ self._vertical_crossings(centre, points[members, 1], edges)
+                        ^ self._crossings(on_line, points[members, 0], edges)
+                    )
+                inside[members] = state
+        for cz, cy, r in self._circles:
+            inside |= np.hypot(points[:, 0] - cz, points[:, 1] - cy) < r
+        return inside
+
+    # Parity of edges crossed moving vertically from a cell centre to each point's y
+    def _vertical_crossings(self, centre, ys, edges):
+        swapped = edges[:, [1, 0, 3, 2]]
+        return self._crossings(
+            np.column_stack((np.full(len(ys), centre[1]), np.full(len(ys), centre[0]))),
+            ys,
+            swapped,
+        )
+
+    # Signed distance to the nearest opening boundary, positive inside, capped at max_distance
+    def clearance(self, points, max_distance):
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        distance = np.full(len(points), float(max_distance))
+        if len(self._edges):
+            # Only edges bucketed within max_distance of a point's cell can be nearer
+            reach = int(np.ceil(max_distance / self._cell_size))
+            i, j = self._cell_of(points).T
+            flat = i * self._shape[1] + j
+            for cell in np.unique(flat):
+                members = flat == cell
+                ci, cj = divmod(cell, self._shape[1])
+                nearby = [
+                    self._cells[a * self._shape[1] + b]
+                    for a in range(
+                        max(ci - reach, 0), min(ci + reach + 1, self._shape[0])
+                    )
+                    for b in range(
+                        max(cj - reach, 0), min(cj + reach + 1, self._shape[1])
+                    )
+                ]
+                nearby = np.unique(np.concatenate(nearby))
+                if len(nearby):
+                    distance[members] = np.minimum(
+                        distance[members],
+                        self._edge_distance(points[members], self._edges[nearby]),
+                    )
+        for cz, cy, r in self._circles:
+            distance = np.minimum(
+                distance, np.abs(np.hypot(points[:, 0] - cz, points[:, 1] - cy) - r)
+            )
+        return np.where(self.contains(points), distance, -distance)
+
+    # Whether circles of radius rad centred on the points fit entirely inside an opening
+    def circle_fits(self, points, rad):
+        return self.clearance(points, rad) >= rad
+
 
 # Class to handle physics and optimization calculations for the projectile
 class Projectile:
-    def __init__(self, g, h, target_x, wall_x, wall_y):
+    def __init__(
+        self, g, h, target_x, wall_x, wall_y, cache_size=256, cache_resolution=1e-6
+    ):
         # Initialize projectile parameters
         self._g = g  # Acceleration due to gravity
         self._h = h  # Initial height of the projectile
@@ -66,6 +414,20 @@ class Projectile:
         self._wall_x = wall_x  # Horizontal distance to the wall
         self._wall_y = wall_y  # Height of the wall
 
+        # LRU cache of firing solutions keyed on quantized inputs
+        self._cache = OrderedDict()
+        self._cache_size = cache_size  # Maximum number of cached solutions
+        self._cache_resolution = cache_resolution  # Rounding step for cache keys
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        # Reusable arrays for in-place trajectory generation
+        self._workspace = {}
+
+    # Physical parameters that change the firing solution
+    def parameters(self):
+        return (self._g, self._h, self._target_x, self._wall_x, self._wall_y)
+
     # Calculate the projectile motion to a target x position
     def projectile_motion(self, v0, theta):
         # Calculate the time to reach the target x position
@@ -95,8 +457,35 @@ class Projectile:
         )
         return y_wall
 
+    # Solve the initial velocity (v0) that passes through (target_x, target_y) in closed form
+    def analytic_v0(self, theta, target_y):
+        # y(x) = h + x tan(theta) - g x^2 / (2 v0^2 cos^2(theta)), solved for v0 at x = target_x
+        theta_rad = np.radians(theta)
+        cos_theta = np.cos(theta_rad)
+        rise = self._h + self._target_x * np.tan(theta_rad) - target_y
+
+        # The target must lie below the launch line, otherwise no speed reaches it
+        if rise <= 0 or cos_theta <= 0:
+            return float("nan")
+        return float(np.sqrt(self._g * self._target_x**2 / (2 * cos_theta**2 * rise)))
+
     # Optimize the initial velocity (v0) to hit the target y position
-    def optimize_v0(self, theta, target_y):
+    def optimize_v0(self, theta, target_y, method="analytic"):
+        if method == "analytic":
+            v0 = self.analytic_v0(theta, target_y)
+            if np.isnan(v0):
+                raise ValueError(
+                    f"Target y={target_y} is unreachable at theta={theta} deg"
+                )
+            # Check wall clearance with the exact speed
+            if self.y_at_wall(v0, theta) < self._wall_y:
+                raise ValueError(
+                    f"Trajectory to target y={target_y} at theta={theta} deg hits the wall"
+                )
+            return v0
+        elif method != "slsqp":
+            raise ValueError(f"Unknown optimize_v0 method: {method}")
+
         # Objective function to minimize the difference between actual and target y positions
         def objective(v0):
             _, y = self.projectile_motion(v0[0], theta)
@@ -117,26 +506,730 @@ class Projectile:
         )
         return result.x[0]
 
+    # Solve v0, voltage, wall margin and feasibility for arrays of thetas and target y positions
+    def solve_batch(self, thetas, target_ys):
+        thetas, target_ys = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(target_ys, dtype=float)
+        )
+        theta_rad = np.radians(thetas)
+        cos_theta = np.cos(theta_rad)
+        rise = self._h + self._target_x * np.tan(theta_rad) - target_ys
+
+        # Same closed form as analytic_v0, unreachable targets become NaN
+        reachable = (rise > 0) & (cos_theta > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v0 = np.where(
+                reachable,
+                np.sqrt(self._g * self._target_x**2 / (2 * cos_theta**2 * rise)),
+                np.nan,
+            )
+            wall_margin = self.y_at_wall(v0, thetas) - self._wall_y
+
+        voltage = self.voltage_require(v0)
+        feasible = reachable & (wall_margin >= 0)
+        return v0, voltage, wall_margin, feasible
+
+    # Exact interval of launch speeds that clear the wall and pass through the hoop
+    def feasible_v0_interval(self, thetas, target_ys, hoop_half_height=0.07):
+        thetas, target_ys = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(target_ys, dtype=float)
+        )
+        theta_rad = np.radians(thetas)
+        cos_sq = np.cos(theta_rad) ** 2
+        tan_theta = np.tan(theta_rad)
+
+        # Height at a fixed x rises with v0 towards the launch line h + x tan(theta),
+        # so each height bound is one speed, or no bound once it is above that line
+        def speed_for(x, y):
+            rise = self._h + x * tan_theta - y
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(
+                    rise > 0, np.sqrt(self._g * x**2 / (2 * cos_sq * rise)), np.inf
+                )
+
+        v0_min = np.maximum(
+            speed_for(self._target_x, target_ys - hoop_half_height),
+            speed_for(self._wall_x, self._wall_y),
+        )
+        v0_max = speed_for(self._target_x, target_ys + hoop_half_height)
+        feasible = (np.cos(theta_rad) > 0) & np.isfinite(v0_min) & (v0_min <= v0_max)
+        v0_min = np.where(feasible, v0_min, np.nan)
+        v0_max = np.where(feasible, v0_max, np.nan)
+        return v0_min, v0_max, feasible
+
+    # Search theta and v0 together for the lowest-voltage shot that clears the wall
+    def optimize_theta_v0(self, target_y, theta_range=(1.0, 89.0), theta_step=0.5):
+        # Coarse scan of every theta in one solve_batch call
+        thetas = np.arange(theta_range[0], theta_range[1] + theta_step / 2, theta_step)
+        _, voltage, _, feasible = self.solve_batch(thetas, target_y)
+        if not np.any(feasible):
+            raise ValueError(f"Target y={target_y} is unreachable at any theta")
+        best = thetas[feasible][np.argmin(voltage[0][feasible])]
+
+        # Fine scans around the best angle and both edges of the feasible band
+        first, last = np.flatnonzero(feasible)[[0, -1]]
+        low_edge = np.linspace(thetas[max(first - 1, 0)], thetas[first], 101)
+        high_edge = np.linspace(
+            thetas[last], thetas[min(last + 1, len(thetas) - 1)], 101
+        )
+        fine_thetas = np.linspace(
+            max(best - theta_step, theta_range[0]),
+            min(best + theta_step, theta_range[1]),
+            101,
+        )
+        v0, voltage, _, feasible = self.solve_batch(
+            np.concatenate([fine_thetas, low_edge, high_edge]), target_y
+        )
+        theta_band = (
+            float(low_edge[feasible[101:202]][0]),
+            float(high_edge[feasible[202:]][-1]),
+        )
+        candidates = np.flatnonzero(feasible[:101])
+        i = candidates[np.argmin(voltage[0][candidates])]
+        voltage_optimized = (float(voltage[0][i]), float(voltage[1][i]))
+        return float(fine_thetas[i]), float(v0[i]), voltage_optimized, theta_band
+
     # Generate the trajectory points for the projectile motion
-    def trajectory(self, v0, theta, num_points=1000):
+    def trajectory(self, v0, theta, num_points=1000, out=None):
         # Calculate the time intervals and positions for the projectile's trajectory
         theta_rad = np.radians(theta)
         t_max = 2 * v0 * np.sin(theta_rad) / self._g
+        if out is not None:
+            return self._trajectory_into(v0, theta_rad, t_max, out)
         t = np.linspace(0, t_max, num_points)
         x = v0 * np.cos(theta_rad) * t
         y = self._h + v0 * np.sin(theta_rad) * t - 0.5 * self._g * t**2
         return x, y
-    
+
+    # Batch of trajectories as (N, num_points) arrays, each sampled like trajectory()
+    def trajectory_family(self, v0s, thetas, num_points=1000):
+        v0s, thetas = np.broadcast_arrays(
+            np.asarray(v0s, dtype=float), np.asarray(thetas, dtype=float)
+        )
+        v0s = v0s.reshape(-1, 1)
+        theta_rad = np.radians(thetas.reshape(-1, 1))
+        t = np.linspace(0, 1, num_points) * (2 * v0s * np.sin(theta_rad) / self._g)
+        x = v0s * np.cos(theta_rad) * t
+        y = self._h + v0s * np.sin(theta_rad) * t - 0.5 * self._g * t**2
+        return x, y
+
+    # Analytic position of the ball at flight time t (seconds), scalar or array
+    def position(self, v0, theta, t):
+        theta_rad = np.radians(theta)
+        x = v0 * np.cos(theta_rad) * t
+        y = self._h + v0 * np.sin(theta_rad) * t - 0.5 * self._g * t**2
+        return x, y
+
+    # Flight time covered by trajectory(), from launch until back at launch height
+    def flight_time(self, v0, theta):
+        return float(2 * v0 * np.sin(np.radians(theta)) / self._g)
+
+    # Write the trajectory into existing (x, y) buffers without allocating new arrays
+    def _trajectory_into(self, v0, theta_rad, t_max, out):
+        x, y = out
+        unit = self._unit_time(len(x), x.dtype)
+        t_max = float(t_max)
+
+        # x = v0 cos(theta) t and y = h + t (v0 sin(theta) - g t / 2), with t = unit * t_max
+        np.multiply(unit, float(v0 * np.cos(theta_rad)) * t_max, out=x)
+        np.multiply(unit, -0.5 * self._g * t_max, out=y)
+        y += float(v0 * np.sin(theta_rad))
+        y *= unit
+        y *= t_max
+        y += self._h
+        return x, y
+
+    # Pooled 0..1 time base shared by every in-place trajectory of the same size and dtype
+    def _unit_time(self, num_points, dtype):
+        key = (num_points, np.dtype(dtype))
+        if key not in self._workspace:
+            self._workspace[key] = np.linspace(0, 1, num_points, dtype=dtype)
+        return self._workspace[key]
+
+    # Pooled (x, y) output buffers for trajectory(..., out=...)
+    def trajectory_workspace(self, num_points=1000, dtype=np.float64):
+        key = ("out", num_points, np.dtype(dtype))
+        if key not in self._workspace:
+            self._workspace[key] = (
+                np.empty(num_points, dtype=dtype),
+                np.empty(num_points, dtype=dtype),
+            )
+        return self._workspace[key]
+
+    # Generate the fewest trajectory points that stay within a pixel tolerance of the parabola
+    def adaptive_trajectory(self, v0, theta, scale=460, tolerance=0.5):
+        # y(x) = h + x tan(theta) - c x^2, a chord of width dx misses it by at most c dx^2 / 4
+        theta_rad = np.radians(theta)
+        c = self._g / (2 * v0**2 * np.cos(theta_rad) ** 2)
+        x_end = 2 * v0**2 * np.sin(theta_rad) * np.cos(theta_rad) / self._g
+        max_dx = 2 * np.sqrt(tolerance / (scale * c))
+        num_points = max(int(np.ceil(x_end / max_dx)), 1) + 1
+
+        x = np.linspace(0, x_end, num_points)
+        y = self._h + x * np.tan(theta_rad) - c * x**2
+        return x, y
+
     # Find voltage require for v0
     def voltage_require(self, v0):
         voltage_optimized = (v0 - 3.6887) / 0.0518
         v_adjust = voltage_optimized * 3 / 28
         return voltage_optimized, v_adjust
 
+    # Get v0, voltage and trajectory for a target, reusing cached solutions when possible
+    def solution(self, theta, target_y, firing_table=None):
+        # Round every input that changes the solution to the cache resolution
+        key = tuple(
+            round(value / self._cache_resolution)
+            for value in (theta, target_y) + self.parameters()
+        )
+        if key in self._cache:
+            self._cache_hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        self._cache_misses += 1
+
+        feasible = False
+        if firing_table is not None:
+            try:
+                v0, voltage, _, feasible = firing_table.lookup(theta, target_y)
+            except (ValueError, OSError):
+                # Outside the table, or the table could not be built or read
+                feasible = False
+
+        # Solve directly without a table, outside it or near its feasibility edge
+        if not feasible:
+            v0 = self.optimize_v0(theta, target_y)
+            voltage = self.voltage_require(v0)
+
+        x, y = self.trajectory(v0, theta)
+        # Cached arrays are shared between callers, so make them read-only
+        x.flags.writeable = False
+        y.flags.writeable = False
+
+        self._cache[key] = (v0, voltage, x, y)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return self._cache[key]
+
+    # Report solution cache hits, misses and size
+    def cache_info(self):
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "size": len(self._cache),
+            "max_size": self._cache_size,
+        }
+
+    # Empty the solution cache and reset its counters
+    def cache_clear(self):
+        self._cache.clear()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+
+# Class to handle projectile physics with quadratic air drag, integrated numerically
+class DragProjectile(Projectile):
+    def __init__(
+        self,
+        g,
+        h,
+        target_x,
+        wall_x,
+        wall_y,
+        mass=0.02,
+        drag_coefficient=0.47,
+        diameter=0.04,
+        air_density=1.225,
+        dt=0.005,
+        **kwargs,
+    ):
+        super().__init__(g, h, target_x, wall_x, wall_y, **kwargs)
+        self._mass = mass  # Ball mass (kg)
+        self._drag_coefficient = drag_coefficient  # Drag coefficient of the ball
+        self._diameter = diameter  # Ball diameter (m)
+        self._air_density = air_density  # Air density (kg/m^3)
+        self._dt = dt  # Fixed RK4 time step (s)
+        self._max_time = 10.0  # Integration time limit (s)
+        self._last_flight = None  # Last integrated shot, reused by position()
+
+        # Drag deceleration is k * |v| * v
+        area = math.pi * (diameter / 2) ** 2
+        self._k = 0.5 * air_density * drag_coefficient * area / mass
+
+    # Physical parameters that change the firing solution
+    def parameters(self):
+        return super().parameters() + (
+            self._mass,
+            self._drag_coefficient,
+            self._diameter,
+            self._air_density,
+            self._dt,
+        )
+
+    # Advance the state of every shot by one RK4 step
+    def _rk4_step(self, x, y, vx, vy):
+        dt = self._dt
+        k, g = self._k, self._g
+
+        def accel(vx, vy):
+            speed = np.sqrt(vx**2 + vy**2)
+            return -k * speed * vx, -g - k * speed * vy
+
+        ax1, ay1 = accel(vx, vy)
+        ax2, ay2 = accel(vx + 0.5 * dt * ax1, vy + 0.5 * dt * ay1)
+        ax3, ay3 = accel(vx + 0.5 * dt * ax2, vy + 0.5 * dt * ay2)
+        ax4, ay4 = accel(vx + dt * ax3, vy + dt * ay3)
+
+        x_new = x + dt * (vx + dt / 6 * (ax1 + ax2 + ax3))
+        y_new = y + dt * (vy + dt / 6 * (ay1 + ay2 + ay3))
+        vx_new = vx + dt / 6 * (ax1 + 2 * ax2 + 2 * ax3 + ax4)
+        vy_new = vy + dt / 6 * (ay1 + 2 * ay2 + 2 * ay3 + ay4)
+        return x_new, y_new, vx_new, vy_new
+
+    # Integrate a batch of shots and return their heights where they cross each x in xs
+    def heights_at(self, v0s, thetas, xs):
+        v0s, thetas = np.broadcast_arrays(
+            np.asarray(v0s, dtype=float), np.asarray(thetas, dtype=float)
+        )
+        shape = v0s.shape
+        xs = np.atleast_1d(np.asarray(xs, dtype=float))
+        theta_rad = np.radians(thetas.ravel())
+
+        x = np.zeros(theta_rad.shape)
+        y = np.full(theta_rad.shape, float(self._h))
+        vx = v0s.ravel() * np.cos(theta_rad)
+        vy = v0s.ravel() * np.sin(theta_rad)
+        heights = np.full(theta_rad.shape + xs.shape, np.nan)
+
+        # Shots stop once they pass the last x or hit the ground
+        for _ in range(int(self._max_time / self._dt)):
+            x_new, y_new, vx_new, vy_new = self._rk4_step(x, y, vx, vy)
+            for i, stop_x in enumerate(xs):
+                crossed = (x < stop_x) & (x_new >= stop_x) & (y >= 0)
+                if np.any(crossed):
+                    # Cubic Hermite interpolation in x using the slopes vy/vx
+                    x0, x1 = x[crossed], x_new[crossed]
+                    span = x1 - x0
+                    s = (stop_x - x0) / span
+                    m0 = vy[crossed] / vx[crossed] * span
+                    m1 = vy_new[crossed] / vx_new[crossed] * span
+                    heights[crossed, i] = (
+                        (2 * s**3 - 3 * s**2 + 1) * y[crossed]
+                        + (s**3 - 2 * s**2 + s) * m0
+                        + (-2 * s**3 + 3 * s**2) * y_new[crossed]
+                        + (s**3 - s**2) * m1
+                    )
+            x, y, vx, vy = x_new, y_new, vx_new, vy_new
+            if not np.any((x < xs[-1]) & (y >= 0)):
+                break
+        return heights.reshape(shape + xs.shape)
+
+    # Calculate the projectile motion to a target x position
+    def projectile_motion(self, v0, theta):
+        y = self.heights_at(v0, theta, [self._target_x])[..., 0]
+        return np.full_like(y, self._target_x), y
+
+    # Calculate the y position of the projectile at a specific wall x position
+    def y_at_wall(self, v0, theta):
+        return self.heights_at(v0, theta, [self._wall_x])[..., 0]
+
+    # Bracket the v0 that crosses x at the given heights with batches of candidate speeds
+    def _bracket_v0(self, thetas, heights, x, v0_range, candidates, iterations):
+        rows = np.arange(thetas.size)
+        lo = np.full(thetas.size, v0_range[0])
+        hi = np.full(thetas.size, v0_range[1])
+        reachable = np.ones(thetas.size, dtype=bool)
+        fractions = np.linspace(0, 1, candidates)
+
+        for iteration in range(iterations):
+            # One integration call covers every candidate speed of every target
+            speeds = lo[:, None] + (hi - lo)[:, None] * fractions
+            miss = (
+                self.heights_at(speeds, thetas[:, None], [x])[..., 0] - heights[:, None]
+            )
+            above = miss >= 0  # Shots that hit the ground count as below
+            idx = np.argmax(above, axis=1)
+
+            # Unreachable within v0_range, or already above at the slowest speed
+            reachable &= above.any(axis=1)
+            if iteration == 0:
+                above_at_min = above[:, 0]
+                reachable &= ~above_at_min
+            idx = np.maximum(idx, 1)
+            lo, hi = speeds[rows, idx - 1], speeds[rows, idx]
+            miss_lo, miss_hi = miss[rows, idx - 1], miss[rows, idx]
+
+        # Linear interpolation inside the final bracket
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(
+                np.isfinite(miss_lo), -miss_lo / (miss_hi - miss_lo), 0.5
+            )
+        v0 = np.where(reachable, lo + (hi - lo) * fraction, np.nan)
+        return v0, reachable, above_at_min
+
+    # Shooting method: bracket v0 for every target with batches of candidate speeds
+    def shoot_v0(
+        self, thetas, target_ys, v0_range=(1.0, 30.0), candidates=32, iterations=3
+    ):
+        thetas, target_ys = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(target_ys, dtype=float)
+        )
+        shape = thetas.shape
+        thetas, target_ys = thetas.ravel(), target_ys.ravel()
+        v0, reachable, _ = self._bracket_v0(
+            thetas, target_ys, self._target_x, v0_range, candidates, iterations
+        )
+        wall_margin = self.y_at_wall(v0, thetas) - self._wall_y
+        return v0.reshape(shape), wall_margin.reshape(shape), reachable.reshape(shape)
+
+    # Launch speeds that clear the wall and pass through the hoop, by the shooting method
+    def feasible_v0_interval(
+        self, thetas, target_ys, hoop_half_height=0.07, v0_range=(1.0, 30.0)
+    ):
+        thetas, target_ys = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(target_ys, dtype=float)
+        )
+        shape = thetas.shape
+        thetas, target_ys = thetas.ravel(), target_ys.ravel()
+
+        # Both hoop edges are bracketed in one batch, the wall height in another
+        n = thetas.size
+        hoop = self._bracket_v0(
+            np.tile(thetas, 2),
+            np.concatenate(
+                [target_ys - hoop_half_height, target_ys + hoop_half_height]
+            ),
+            self._target_x,
+            v0_range,
+            32,
+            3,
+        )
+        wall = self._bracket_v0(
+            thetas, np.full(n, float(self._wall_y)), self._wall_x, v0_range, 32, 3
+        )
+        v0, reachable, above_at_min = (np.concatenate(pair) for pair in zip(hoop, wall))
+
+        # Boundaries already crossed at the slowest speed, or never within v0_range
+        v0 = np.where(above_at_min, v0_range[0], v0)
+        v0 = np.where(~reachable & ~above_at_min, v0_range[1], v0)
+        never_low = ~reachable[:n] & ~above_at_min[:n]
+        never_wall = ~reachable[2 * n :] & ~above_at_min[2 * n :]
+
+        v0_min = np.maximum(v0[:n], v0[2 * n :])
+        v0_max = v0[n : 2 * n]
+        feasible = ~never_low & ~never_wall & (v0_min <= v0_max)
+        v0_min = np.where(feasible, v0_min, np.nan)
+        v0_max = np.where(feasible, v0_max, np.nan)
+        return v0_min.reshape(shape), v0_max.reshape(shape), feasible.reshape(shape)
+
+    # Optimize the initial velocity (v0) to hit the target y position
+    def optimize_v0(self, theta, target_y, method="shooting"):
+        # SLSQP uses the drag model, the drag-free closed form does not apply here
+        if method == "slsqp":
+            return super().optimize_v0(theta, target_y, method)
+        if method != "shooting":
+            raise ValueError(f"Unknown DragProjectile optimize_v0 method: {method}")
+
+        v0, wall_margin, reachable = self.shoot_v0(theta, target_y)
+        if not reachable:
+            raise ValueError(f"Target y={target_y} is unreachable at theta={theta} deg")
+        if wall_margin < 0:
+            raise ValueError(
+                f"Trajectory to target y={target_y} at theta={theta} deg hits the wall"
+            )
+        return float(v0)
+
+    # Solve v0, voltage, wall margin and feasibility for arrays of thetas and target y positions
+    def solve_batch(self, thetas, target_ys):
+        v0, wall_margin, reachable = self.shoot_v0(thetas, target_ys)
+        voltage = self.voltage_require(v0)
+        feasible = reachable & (wall_margin >= 0)
+        return v0, voltage, wall_margin, feasible
+
+    # Generate the trajectory points for the projectile motion
+    def trajectory(self, v0, theta, num_points=1000, out=None):
+        t_steps, states = self._flight(v0, theta)
+
+        # Resample the fixed steps onto num_points evenly spaced times
+        if out is not None:
+            num_points = len(out[0])
+        t = np.linspace(0, t_steps[-1], num_points)
+        x = np.interp(t, t_steps, states[:, 0])
+        y = np.interp(t, t_steps, states[:, 1])
+
+        # The integration itself allocates, out= only keeps the caller's buffers
+        if out is not None:
+            out[0][...] = x
+            out[1][...] = y
+            return out
+        return x, y
+
+    # Integrate a batch of shots together and resample them onto num_points common times
+    def trajectory_family(self, v0s, thetas, num_points=1000):
+        v0s, thetas = np.broadcast_arrays(
+            np.asarray(v0s, dtype=float), np.asarray(thetas, dtype=float)
+        )
+        theta_rad = np.radians(thetas.ravel())
+        state = (
+            np.zeros(theta_rad.shape),
+            np.full(theta_rad.shape, float(self._h)),
+            v0s.ravel() * np.cos(theta_rad),
+            v0s.ravel() * np.sin(theta_rad),
+        )
+        xs, ys = [state[0]], [state[1]]
+        for _ in range(int(self._max_time / self._dt)):
+            state = self._rk4_step(*state)
+            xs.append(state[0])
+            ys.append(state[1])
+            if np.all(state[1] < 0):
+                break
+
+        # Linear interpolation between the shared RK4 steps, points below ground are NaN
+        xs, ys = np.array(xs), np.array(ys)
+        steps = np.linspace(0, len(xs) - 1, num_points)
+        i = np.minimum(steps.astype(int), len(xs) - 2)
+        f = (steps - i)[:, None]
+        x = ((1 - f) * xs[i] + f * xs[i + 1]).T
+        y = ((1 - f) * ys[i] + f * ys[i + 1]).T
+        y[y < 0] = np.nan
+        return x, y
+
+    # Integrate one shot until it is back on the ground, keeping the last shot for playback
+    def _flight(self, v0, theta):
+        key = (float(v0), float(theta))
+        if self._last_flight is not None and self._last_flight[0] == key:
+            return self._last_flight[1]
+
+        theta_rad = np.radians(theta)
+        state = (0.0, float(self._h), v0 * np.cos(theta_rad), v0 * np.sin(theta_rad))
+        states = [state]
+        for _ in range(int(self._max_time / self._dt)):
+            state = self._rk4_step(*state)
+            states.append(state)
+            if state[1] < 0:
+                break
+
+        states = np.array(states)
+        t_steps = np.arange(len(states)) * self._dt
+        self._last_flight = (key, (t_steps, states))
+        return t_steps, states
+
+    # Position of the ball at flight time t, interpolated between the RK4 steps
+    def position(self, v0, theta, t):
+        t_steps, states = self._flight(v0, theta)
+        x = np.interp(t, t_steps, states[:, 0])
+        y = np.interp(t, t_steps, states[:, 1])
+        return x, y
+
+    # Flight time covered by trajectory(), from launch until the ball reaches the ground
+    def flight_time(self, v0, theta):
+        t_steps, _ = self._flight(v0, theta)
+        return float(t_steps[-1])
+
+    # Generate the fewest trajectory points that stay within a pixel tolerance of the path
+    def adaptive_trajectory(self, v0, theta, scale=460, tolerance=0.5):
+        # Drag makes the curvature vary, so bound it by its maximum along the dense path
+        x_dense, y_dense = self.trajectory(v0, theta)
+        slope = np.gradient(y_dense, x_dense)
+        c = 0.5 * np.max(np.abs(np.gradient(slope, x_dense)))
+        max_dx = 2 * np.sqrt(tolerance / (scale * c))
+        num_points = max(int(np.ceil(x_dense[-1] / max_dx)), 1) + 1
+
+        x = np.linspace(0, x_dense[-1], num_points)
+        y = np.interp(x, x_dense, y_dense)
+        return x, y
+
+
+# Class to precompute firing solutions over a (theta, target_y) grid and look them up from disk
+class FiringTable:
+    # Layers stored per grid node
+    V0, VOLTAGE, V_ADJUST, WALL_MARGIN, FEASIBLE = range(5)
+
+    def __init__(
+        self,
+        projectile,
+        theta_range=(20.0, 70.0),
+        theta_step=0.25,
+        y_range=(0.70, 1.25),
+        y_step=0.001,
+        directory="data/firing_tables",
+    ):
+        # A drag table would need a shooting solve per node (minutes at this resolution)
+        if isinstance(projectile, DragProjectile):
+            raise ValueError(
+                "FiringTable needs a closed-form Projectile, not DragProjectile"
+            )
+        self._projectile = projectile  # Projectile the table is built for
+        self._theta_min, self._theta_max = theta_range  # Launch angle range (degrees)
+        self._theta_step = theta_step  # Launch angle resolution (degrees)
+        self._y_min, self._y_max = y_range  # Target y range (meters)
+        self._y_step = y_step  # Target y resolution (meters)
+        self._n_theta = int(round((self._theta_max - self._theta_min) / theta_step)) + 1
+        self._n_y = int(round((self._y_max - self._y_min) / y_step)) + 1
+        self._table = None  # Memory-mapped grid, opened on first lookup
+
+        # The file name is a hash of everything that changes the table contents
+        key = repr(
+            (
+                type(projectile).__name__,
+                projectile.parameters(),
+                self._theta_min,
+                self._theta_max,
+                self._n_theta,
+                self._y_min,
+                self._y_max,
+                self._n_y,
+            )
+        )
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        self._path = os.path.join(directory, f"firing_table_{digest}.npy")
+
+    # Evaluate every grid node with Projectile.solve_batch and save it as a .npy file
+    def build(self):
+        thetas = np.linspace(self._theta_min, self._theta_max, self._n_theta)
+        target_ys = np.linspace(self._y_min, self._y_max, self._n_y)
+        theta_grid, y_grid = np.meshgrid(thetas, target_ys, indexing="ij")
+        v0, voltage, wall_margin, feasible = self._projectile.solve_batch(
+            theta_grid, y_grid
+        )
+
+        # Layers are the last axis so each node's values sit next to each other
+        table = np.stack(
+            [v0, voltage[0], voltage[1], wall_margin, feasible.astype(float)], axis=-1
+        )
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = self._path + ".tmp.npy"
+        np.save(tmp_path, table)
+        os.replace(tmp_path, self._path)
+        self._table = None
+
+    # Open the table memory-mapped, building it first if it is not on disk yet
+    def _open(self):
+        if self._table is None:
+            if not os.path.exists(self._path):
+                self.build()
+            self._table = np.load(self._path, mmap_mode="r")
+        return self._table
+
+    # Bilinear lookup of the firing solution at (theta, target_y)
+    def lookup(self, theta, target_y):
+        if not (
+            self._theta_min <= theta <= self._theta_max
+            and self._y_min <= target_y <= self._y_max
+        ):
+            raise ValueError(
+                f"theta={theta}, target_y={target_y} is outside the firing table"
+            )
+        table = self._open()
+
+        # Fractional grid position and the cell that contains it
+        fi = (theta - self._theta_min) / self._theta_step
+        fj = (target_y - self._y_min) / self._y_step
+        i = min(int(fi), self._n_theta - 2)
+        j = min(int(fj), self._n_y - 2)
+        ti = fi - i
+        tj = fj - j
+
+        # Only the four corner nodes are read from disk
+        cell = np.asarray(table[i : i + 2, j : j + 2])
+        weights = np.array(
+            [[(1 - ti) * (1 - tj), (1 - ti) * tj], [ti * (1 - tj), ti * tj]]
+        )
+        feasible = bool(np.all(cell[:, :, self.FEASIBLE] == 1.0))
+
+        # 1/v0^2 is linear in target_y, so interpolate it instead of v0 itself
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_v0_sq = np.sum(weights / cell[:, :, self.V0] ** 2)
+            v0 = float(1 / np.sqrt(inv_v0_sq))
+        wall_margin = float(np.sum(weights * cell[:, :, self.WALL_MARGIN]))
+        voltage = self._projectile.voltage_require(v0)
+        return v0, voltage, wall_margin, feasible
+
+
+# Class to load images once in the display's pixel format and cache their scaled variants
+class AssetManager:
+    def __init__(self, directory="data/images"):
+        self._directory = directory  # Folder the image names are relative to
+        self._images = {}  # Name -> converted full-size image
+        self._scaled = {}  # (name, width, height) -> scaled image
+
+    # Load an image and convert it to the display format so blits skip per-pixel conversion
+    def load(self, name):
+        if name not in self._images:
+            image = pygame.image.load(os.path.join(self._directory, name))
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha()
+            self._images[name] = image
+        return self._images[name]
+
+    # The image scaled to size, scaled only the first time it is asked for
+    def scaled(self, name, size):
+        key = (name, int(size[0]), int(size[1]))
+        if key not in self._scaled:
+            self._scaled[key] = pygame.transform.scale(self.load(name), key[1:])
+        return self._scaled[key]
+
+
+# Class to collect rolling per-phase timings for the performance overlay
+class PerformanceMonitor:
+    # Phases in the order the overlay lists them
+    PHASES = ("events", "solver", "draw", "manager", "flip")
+
+    def __init__(self, window=240):
+        self._enabled = False  # Timing hooks do nothing while disabled
+        self._window = window  # Samples kept per phase
+        self._samples = {}  # Phase name -> recent durations (s)
+
+    # Whether the timing hooks are recording
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # Switch timing on or off, starting from empty windows
+    def toggle(self):
+        self._enabled = not self._enabled
+        self._samples.clear()
+
+    # Start timing a phase, returning None when disabled so stop() returns at once
+    def start(self):
+        return time.perf_counter() if self._enabled else None
+
+    # Record the time since start() under phase
+    def stop(self, phase, start):
+        if start is None:
+            return
+        if phase not in self._samples:
+            self._samples[phase] = deque(maxlen=self._window)
+        self._samples[phase].append(time.perf_counter() - start)
+
+    # Rolling mean and p99 in milliseconds of every phase seen so far
+    def stats(self):
+        return {
+            phase: (
+                1e3 * np.mean(self._samples[phase]),
+                1e3 * np.percentile(self._samples[phase], 99),
+            )
+            for phase in self.PHASES
+            if phase in self._samples
+        }
+
 
 # Class to manage the GUI elements and drawing
 class SimulatorGUI:
-    def __init__(self, screen, manager, width, height, colors, font):
+    def __init__(
+        self,
+        screen,
+        manager,
+        width,
+        height,
+        colors,
+        font,
+        text_cache_size=128,
+        dirty_rects=False,
+        slow_motion=1.0,
+        assets=None,
+        window=None,
+    ):
         self._screen = screen  # Pygame screen
         self._manager = manager  # Pygame GUI manager
         self._width = width  # Screen width
@@ -144,19 +1237,50 @@ class SimulatorGUI:
         self._colors = colors  # Color dictionary
         self._font = font  # Font for text rendering
         self._animating = False  # Animation state
-        self._point_index = 0  # Index for animating points
+        self._elapsed = 0.0  # Flight time of the animated ball (s)
+        self._slow_motion = slow_motion  # Wall-clock seconds per second of flight
 
         # Define rectangles for UI buttons
         self._back_button_rect = pygame.Rect(50, 790, 200, 50)
         self._start_stop_button_rect = pygame.Rect(1300, 735, 200, 50)
         self._reset_button_rect = pygame.Rect(1300, 795, 200, 50)
-
-        # Load and scale the side view image
-        self._side_view = pygame.image.load(
-            "data/images/side_view_2024-05-21_151130-removebg-preview.png"
-        )
-        self._side_view = pygame.transform.scale(
-            self._side_view, ((0.27 * 460 * 536) / 466, 0.27 * 460)
+        self._snap_button_rect = pygame.Rect(1050, 800, 320, 50)
+
+        # LRU cache of rendered text surfaces keyed by (text, antialias, color)
+        self._text_cache = OrderedDict()
+        self._text_cache_size = text_cache_size
+        self._text_hits = 0
+        self._text_misses = 0
+
+        # Dirty-rect mode: push only changed regions to the display while the scene is unchanged
+        self._dirty_rects = dirty_rects
+        self._scene_key = None  # Scene shown by the last full flip
+        self._regions = {}  # Last drawn state of each tracked region
+        self._ball_rect = None  # Where the ball was drawn last frame
+
+        # Window the logical screen is scaled into, the screen itself when drawing straight to the display
+        self._window = window if window is not None else screen
+        self._window_scale = 1.0
+
+        # Static simulation layer, redrawn only when the solution changes
+        self._background = None
+        self._background_key = None
+
+        # Performance overlay, its text re-rendered a few times per second
+        self._monitor = PerformanceMonitor()
+        self._performance_font = pygame.font.Font(None, 24)
+        self._performance_surface = None
+        self._performance_time = 0.0
+
+        # Translucent trajectory-family layer and the part of it that is not empty
+        self._overlay = None
+        self._overlay_rect = None
+
+        # Load and scale the side view image through the shared asset cache
+        self._assets = assets if assets is not None else AssetManager()
+        self._side_view = self._assets.scaled(
+            "side_view_2024-05-21_151130-removebg-preview.png",
+            ((0.27 * 460 * 536) / 466, 0.27 * 460),
         )
 
     # Draw the setup screen
@@ -171,10 +1295,14 @@ class SimulatorGUI:
         target_y,
         target_z,
         errorr,
+        snap=None,
+        message="Target out of triangle",
     ):
+        start = self._monitor.start()
+
         # Draw the setup UI components
         button_rect = pygame.Rect(50, 790, 200, 50)
-        text_start = self._font.render("Calculate", True, self._colors["BLACK"])
+        text_start = self._render_text("Calculate", True, self._colors["BLACK"])
         text_start_rect = text_start.get_rect(center=button_rect.center)
 
         # Fill the screen with the background color
@@ -205,34 +1333,58 @@ class SimulatorGUI:
         self._manager.draw_ui(self._screen)
 
         # Change button color on hover
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = self.to_logical(pygame.mouse.get_pos())
         calculate_color = (
             self._colors["DARKER_BLUE"]
             if button_rect.collidepoint(mouse_pos)
             else self._colors["BLUE"]
         )
         pygame.draw.rect(self._screen, calculate_color, button_rect, 0, 10)
+        rects = [pygame.Rect(570, 690, 460, 120)]  # Text entries redraw themselves
+        self._track("calculate", button_rect, calculate_color, rects)
         self._screen.blit(text_start, text_start_rect)
 
         # Draw the labels for target y and z text entries
-        text = self._font.render("Target Y", True, self._colors["BLACK"])
+        text = self._render_text("Target Y", True, self._colors["BLACK"])
         self._screen.blit(text, (620, 715))
-        text = self._font.render("mm", True, self._colors["BLACK"])
+        text = self._render_text("mm", True, self._colors["BLACK"])
         self._screen.blit(text, (880, 715))
-        text = self._font.render("Target Z", True, self._colors["BLACK"])
+        text = self._render_text("Target Z", True, self._colors["BLACK"])
         self._screen.blit(text, (620, 765))
-        text = self._font.render("mm", True, self._colors["BLACK"])
+        text = self._render_text("mm", True, self._colors["BLACK"])
         self._screen.blit(text, (880, 765))
-        
+
         # Error
         if errorr == True:
-            text = self._font.render("ERROR!", True, self._colors["RED"])
+            text = self._render_text("ERROR!", True, self._colors["RED"])
             self._screen.blit(text, (1050, 715))
-            text = self._font.render("Target out of triangle", True, self._colors["RED"])
+            text = self._render_text(message, True, self._colors["RED"])
             self._screen.blit(text, (1050, 765))
 
-        # Update the display
-        pygame.display.flip()
+            # Offer the nearest valid (Y, Z) in millimetres
+            if snap is not None:
+                snap_color = (
+                    self._colors["DARKER_BLUE"]
+                    if self._snap_button_rect.collidepoint(mouse_pos)
+                    else self._colors["BLUE"]
+                )
+                pygame.draw.rect(
+                    self._screen, snap_color, self._snap_button_rect, 0, 10
+                )
+                self._track("snap", self._snap_button_rect, snap_color, rects)
+                text = self._render_text(
+                    f"Snap to Y {snap[0]}, Z {snap[1]}", True, self._colors["BLACK"]
+                )
+                self._screen.blit(
+                    text, text.get_rect(center=self._snap_button_rect.center)
+                )
+
+        # Update the display, fully when the triangle, target or error message changed
+        self._present(
+            ("setup", circle_z, circle_y, circle_radius, errorr, snap, message),
+            rects,
+            start,
+        )
 
     # Draw the simulation screen with projectile motion and UI elements
     def draw_simulation(
@@ -249,44 +1401,74 @@ class SimulatorGUI:
         x_trajectory,
         y_trajectory,
         triangle_h,
+        polyline=None,
+        line_points=None,
+        ball=None,
+        theta=None,
+        theta_band=None,
     ):
-        # Draw the simulation UI components
-        self._screen.fill(self._colors["GREY"])
-        # Text area background
-        pygame.draw.rect(
-            self._screen,
-            self._colors["LIGHT_CREAM"],
-            pygame.Rect(290, 715, 970, 150),
-            0,
-            10,
-        )
-        # Button area background
-        pygame.draw.rect(
-            self._screen,
-            self._colors["LIGHT_GREY"],
-            pygame.Rect(1280, 715, 240, 150),
-            0,
-            10,
+        start = self._monitor.start()
+        scale = 460  # Scale for converting meters to pixels
+
+        # Screen-space line points, normally converted once per solution by the caller
+        if line_points is None:
+            x_line, y_line = (
+                polyline if polyline is not None else (x_trajectory, y_trajectory)
+            )
+            line_points = self.screen_points(origin_x, origin_y, x_line, y_line, scale)
+
+        # Everything that only changes with the solution comes from the cached layer
+        background_key = (
+            origin_x,
+            origin_y,
+            target_x,
+            target_y,
+            wall_x,
+            wall_y,
+            triangle_h,
+            v0_optimized,
+            theta,
         )
+        if self._background is None or self._background_key != background_key:
+            self._background = pygame.Surface(self._screen.get_size(), 0, self._screen)
+            self._draw_simulation_background(
+                self._background,
+                origin_x,
+                origin_y,
+                target_x,
+                target_y,
+                wall_x,
+                wall_y,
+                triangle_h,
+                line_points,
+            )
+            self._background_key = background_key
+        self._screen.blit(self._background, (0, 0))
+        if self._overlay is not None:
+            self._screen.blit(
+                self._overlay, self._overlay_rect.topleft, self._overlay_rect
+            )
 
         # Draw the back button
-        back_text = self._font.render("Go back", True, self._colors["BLACK"])
+        back_text = self._render_text("Go back", True, self._colors["BLACK"])
         back_text_rect = back_text.get_rect(center=self._back_button_rect.center)
-        start_stop_text = self._font.render("Start/Stop", True, self._colors["BLACK"])
+        start_stop_text = self._render_text("Start/Stop", True, self._colors["BLACK"])
         start_stop_text_rect = start_stop_text.get_rect(
             center=self._start_stop_button_rect.center
         )
-        reset_text = self._font.render("Reset", True, self._colors["BLACK"])
+        reset_text = self._render_text("Reset", True, self._colors["BLACK"])
         reset_text_rect = reset_text.get_rect(center=self._reset_button_rect.center)
 
         # Change button color on hover
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = self.to_logical(pygame.mouse.get_pos())
         back_color = (
             self._colors["DARKER_BLUE"]
             if self._back_button_rect.collidepoint(mouse_pos)
             else self._colors["BLUE"]
         )
         pygame.draw.rect(self._screen, back_color, self._back_button_rect, 0, 10)
+        rects = []
+        self._track("back", self._back_button_rect, back_color, rects)
         self._screen.blit(back_text, back_text_rect)
         start_stop_color = (
             self._colors["DARKER_GREEN"]
@@ -296,6 +1478,7 @@ class SimulatorGUI:
         pygame.draw.rect(
             self._screen, start_stop_color, self._start_stop_button_rect, 0, 10
         )
+        self._track("start_stop", self._start_stop_button_rect, start_stop_color, rects)
         self._screen.blit(start_stop_text, start_stop_text_rect)
         reset_color = (
             self._colors["DARKER_RED"]
@@ -303,28 +1486,117 @@ class SimulatorGUI:
             else self._colors["RED"]
         )
         pygame.draw.rect(self._screen, reset_color, self._reset_button_rect, 0, 10)
+        self._track("reset", self._reset_button_rect, reset_color, rects)
         self._screen.blit(reset_text, reset_text_rect)
 
+        # Display the optimized initial velocity and target z position and voltage requirement
+        text_optimized_v0 = self._render_text(
+            f"Optimized v0: {v0_optimized:.4f} m/s", True, self._colors["BLACK"]
+        )
+        self._screen.blit(text_optimized_v0, (320, 800))
+        text_pos_z = self._render_text(
+            f"Z position from the left side: {target_z - 10} cm",
+            True,
+            self._colors["BLACK"],
+        )
+        self._screen.blit(text_pos_z, (320, 750))
+        text_optimized_voltage = self._render_text(
+            f"Voltage configurement: {voltage_optimized[1]:.2f} V",
+            True,
+            self._colors["BLACK"],
+        )
+        self._screen.blit(text_optimized_voltage, (800, 750))
+        text_optimized_voltage = self._render_text(
+            f"Optimized voltage: {voltage_optimized[0]:.2f} V",
+            True,
+            self._colors["BLACK"],
+        )
+        self._screen.blit(text_optimized_voltage, (800, 800))
+
+        text_slow_motion = self._render_text(
+            f"Slow motion: {self._slow_motion:g}x (-/=)", True, self._colors["BLACK"]
+        )
+        self._screen.blit(text_slow_motion, (320, 835))
+
+        # Launch angle, and the band of feasible angles when it was optimized
+        if theta is not None:
+            theta_text = f"Theta: {theta:.1f}°"
+            if theta_band is not None:
+                theta_text += f" (band {theta_band[0]:.1f}°-{theta_band[1]:.1f}°)"
+            text_theta = self._render_text(theta_text, True, self._colors["BLACK"])
+            self._screen.blit(text_theta, (800, 835))
+
+        # Draw the ball at its position (meters) for the current flight time
+        ball_rect = None
+        if ball is not None:
+            ball_pos = (origin_x + scale * ball[0], origin_y - scale * ball[1])
+            ball_rect = pygame.draw.circle(
+                self._screen, self._colors["RED"], ball_pos, 0.02 * scale
+            )
+
+        # The ball's old position is erased by the background, its new one drawn over it
+        if self._ball_rect != ball_rect:
+            rects.extend(rect for rect in (self._ball_rect, ball_rect) if rect)
+        self._ball_rect = ball_rect
+
+        # The readouts only change with the solution or slow motion, which force a full flip
+        self._present(
+            ("play",) + background_key + (target_z, self._slow_motion, theta_band),
+            rects,
+            start,
+        )
+
+    # Draw the parts of the simulation screen that only change with the solution
+    def _draw_simulation_background(
+        self,
+        surface,
+        origin_x,
+        origin_y,
+        target_x,
+        target_y,
+        wall_x,
+        wall_y,
+        triangle_h,
+        line_points,
+    ):
+        # Draw the simulation UI components
+        surface.fill(self._colors["GREY"])
+        # Text area background
+        pygame.draw.rect(
+            surface,
+            self._colors["LIGHT_CREAM"],
+            pygame.Rect(290, 715, 970, 150),
+            0,
+            10,
+        )
+        # Button area background
+        pygame.draw.rect(
+            surface,
+            self._colors["LIGHT_GREY"],
+            pygame.Rect(1280, 715, 240, 150),
+            0,
+            10,
+        )
+
         # Draw target position
         scale = 460  # Scale for converting meters to pixels
         target_pos = (origin_x + scale * target_x, origin_y - scale * target_y)
-        # print(target_y)
         pygame.draw.line(
-            self._screen,
+            surface,
             self._colors["WHITE"],
             (target_pos[0], origin_y),
             (target_pos[0], origin_y - (scale * 0.755)),
             10,
         )
         pygame.draw.line(
-            self._screen,
+            surface,
             self._colors["BLUE"],
             (target_pos[0], origin_y - (scale * 0.755)),
             (target_pos[0], origin_y - (scale * 0.755) - (scale * (triangle_h / 1000))),
             10,
         )
         pygame.draw.line(
-            self._screen,
+            surface,
             self._colors["RED"],
             (target_pos[0], target_pos[1] + scale * 0.07),
             (target_pos[0], target_pos[1] - scale * 0.07),
@@ -335,7 +1607,7 @@ class SimulatorGUI:
         wall_pos_x = origin_x + scale * wall_x
         wall_top_y = origin_y - scale * wall_y
         pygame.draw.line(
-            self._screen,
+            surface,
             self._colors["WHITE"],
             (wall_pos_x, origin_y),
             (wall_pos_x, wall_top_y),
@@ -345,14 +1617,14 @@ class SimulatorGUI:
         # Draw scale lines
         for y in range(origin_y, int(origin_y - (scale * 1.4)) + 1, -23):
             pygame.draw.line(
-                self._screen,
+                surface,
                 self._colors["WHITE"],
                 (origin_x - 150, y),
                 (origin_x - 160, y),
                 1,
             )
         pygame.draw.line(
-            self._screen,
+            surface,
             self._colors["WHITE"],
             (origin_x - 160, origin_y + 5),
             (target_pos[0] + 5, origin_y + 5),
@@ -360,7 +1632,7 @@ class SimulatorGUI:
         )
         for x in range(origin_x, int(target_pos[0]) + 1, 23):
             pygame.draw.line(
-                self._screen,
+                surface,
                 self._colors["WHITE"],
                 (x, origin_y + 10),
                 (x, origin_y + 20),
@@ -368,57 +1640,200 @@ class SimulatorGUI:
             )
 
         # Draw the side view image
-        self._screen.blit(
+        surface.blit(
             self._side_view,
             (origin_x - (0.27 * scale * 536) / 466, origin_y - 0.27 * scale),
         )
 
-        # Display the optimized initial velocity and target z position and voltage requirement
-        text_optimized_v0 = self._font.render(
-            f"Optimized v0: {v0_optimized:.4f} m/s", True, self._colors["BLACK"]
-        )
-        self._screen.blit(text_optimized_v0, (320, 800))
-        text_pos_z = self._font.render(
-            f"Z position from the left side: {target_z - 10} cm", True, self._colors["BLACK"]
-        )
-        self._screen.blit(text_pos_z, (320, 750))
-        text_optimized_voltage = self._font.render(
-            f"Voltage configurement: {voltage_optimized[1]:.2f} V", True, self._colors["BLACK"]
-        )
-        self._screen.blit(text_optimized_voltage, (800, 750))
-        text_optimized_voltage = self._font.render(
-            f"Optimized voltage: {voltage_optimized[0]:.2f} V", True, self._colors["BLACK"]
-        )
-        self._screen.blit(text_optimized_voltage, (800, 800))
-
         # Draw the trajectory of the projectile
-        points = [
-            (origin_x + scale * x, origin_y - scale * y)
-            for x, y in zip(x_trajectory, y_trajectory)
-            if y >= 0
-        ]
-        if points:
-            pygame.draw.lines(self._screen, self._colors["WHITE"], False, points, 2)
-
-        # Animate the projectile along the trajectory
-        if self._animating:
-            if self._point_index < len(points):
-                ball_pos = points[self._point_index]
-                pygame.draw.circle(
-                    self._screen, self._colors["RED"], ball_pos, 0.02 * scale
-                )
-                self._point_index += 15
-            else:
-                self._point_index = 0
-        elif not self._animating and self._point_index > 0:
-            ball_pos = points[self._point_index]
-            pygame.draw.circle(
-                self._screen, self._colors["RED"], ball_pos, 0.02 * scale
+        if len(line_points) > 1:
+            pygame.draw.lines(
+                surface, self._colors["WHITE"], False, line_points.tolist(), 2
             )
-        if self._point_index >= len(points):
-            self._point_index = 0
 
-        pygame.display.flip()
+    # Advance the ball by dt wall-clock seconds, looping over a flight of flight_time seconds
+    def advance(self, dt, flight_time):
+        if self._animating and flight_time > 0:
+            # A long frame simply moves the ball further, so dropped frames are skipped
+            self._elapsed = (self._elapsed + dt / self._slow_motion) % flight_time
+
+    # Whether the ball is on screen, either flying or paused mid-flight
+    def ball_visible(self):
+        return self._animating or self._elapsed > 0
+
+    # Convert a trajectory in meters to read-only integer screen points above the ground
+    def screen_points(self, origin_x, origin_y, x, y, scale=460):
+        above_ground = y >= 0
+        points = np.rint(
+            np.column_stack(
+                (origin_x + scale * x[above_ground], origin_y - scale * y[above_ground])
+            )
+        ).astype(np.int32)
+        points.setflags(write=False)
+        return points
+
+    # Render (N, M) trajectories in meters into the overlay layer as one hit-density image
+    def set_overlay(self, origin_x, origin_y, x, y, color, scale=460, opacity=0.12):
+        width, height = self._screen.get_size()
+        with np.errstate(invalid="ignore"):
+            valid = np.isfinite(y) & (y >= 0)
+        px = np.rint(origin_x + scale * x[valid]).astype(np.intp)
+        py = np.rint(origin_y - scale * y[valid]).astype(np.intp)
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+
+        # Count the samples in each pixel, then let every hit add the same opacity
+        counts = np.bincount(
+            px[inside] * height + py[inside], minlength=width * height
+        ).reshape(width, height)
+        layer = pygame.Surface((width, height), pygame.SRCALPHA)
+        layer.fill(tuple(color) + (0,))
+        alpha = pygame.surfarray.pixels_alpha(layer)
+        alpha[...] = 255 * (1 - (1 - opacity) ** counts)
+        del alpha  # Unlock the surface
+
+        self._overlay = layer
+        self._overlay_rect = layer.get_bounding_rect()
+        self.invalidate()
+
+    # Remove the trajectory-family overlay
+    def clear_overlay(self):
+        self._overlay = None
+        self._overlay_rect = None
+        self.invalidate()
+
+    # Drop the cached simulation background so the next frame redraws it
+    def invalidate_background(self):
+        self._background = None
+        self.invalidate()
+
+    # Force the next frame to flip the whole display
+    def invalidate(self):
+        self._scene_key = None
+
+    # Record a region's drawn state and mark it dirty when that state changed
+    def _track(self, name, rect, state, rects):
+        if self._regions.get(name) != state:
+            self._regions[name] = state
+            rects.append(rect)
+
+    # Show the frame: a full flip for a new scene, otherwise only the dirty rects
+    def _present(self, scene_key, rects, start=None):
+        self._draw_performance(rects)
+        self._monitor.stop("draw", start)
+
+        start = self._monitor.start()
+        if not self._dirty_rects or scene_key != self._scene_key:
+            self._copy_to_window([self._screen.get_rect()])
+            pygame.display.flip()
+            self._scene_key = scene_key
+        elif rects:
+            pygame.display.update(self._copy_to_window(rects))
+        self._monitor.stop("flip", start)
+
+    # Copy the given screen rects into the window, scaled to its size, and return them in window space
+    def _copy_to_window(self, rects):
+        if self._window is self._screen:
+            return rects
+
+        scale = self._window_scale
+        window_rects = []
+        for rect in rects:
+            rect = self._screen.get_rect().clip(rect)
+            if not rect.width or not rect.height:
+                continue
+            if scale == 1.0:
+                self._window.blit(self._screen, rect, rect)
+                window_rects.append(rect)
+                continue
+
+            # Round outwards so neighbouring rects meet without gaps
+            left, top = int(rect.left * scale), int(rect.top * scale)
+            right = math.ceil(rect.right * scale)
+            bottom = math.ceil(rect.bottom * scale)
+            window_rect = pygame.Rect(left, top, right - left, bottom - top)
+            self._window.blit(
+                pygame.transform.smoothscale(
+                    self._screen.subsurface(rect), window_rect.size
+                ),
+                window_rect,
+            )
+            window_rects.append(window_rect)
+        return window_rects
+
+    # Fit the logical screen into the resized window, scaled uniformly from the top left corner
+    def resize_window(self):
+        if self._window is self._screen:
+            return
+        self._window = pygame.display.get_surface()
+        width, height = self._window.get_size()
+        self._window_scale = min(width / self._width, height / self._height)
+        self._manager.mouse_pos_scale_factor = [1 / self._window_scale] * 2
+        self._window.fill(self._colors["BLACK"])
+        self.invalidate()
+
+    # Map a window position, such as a mouse event's, to logical screen coordinates
+    def to_logical(self, pos):
+        return (pos[0] / self._window_scale, pos[1] / self._window_scale)
+
+    # Performance monitor whose timings the overlay shows
+    @property
+    def monitor(self):
+        return self._monitor
+
+    # Show or hide the performance overlay
+    def toggle_performance(self):
+        self._monitor.toggle()
+        self._performance_surface = None
+        self.invalidate()
+
+    # Draw the performance overlay in the top right corner, refreshing its text four times a second
+    def _draw_performance(self, rects):
+        if not self._monitor.enabled:
+            return
+        now = time.perf_counter()
+        if self._performance_surface is None or now - self._performance_time >= 0.25:
+            lines = [
+                f"{phase}: {mean:.2f} ms avg, {p99:.2f} ms p99"
+                for phase, (mean, p99) in self._monitor.stats().items()
+            ]
+            info = self.text_cache_info()
+            lookups = info["hits"] + info["misses"]
+            if lookups:
+                lines.append(f"text cache: {100 * info['hits'] / lookups:.1f}% hits")
+
+            surface = pygame.Surface((340, 10 + 22 * len(lines)))
+            surface.fill(self._colors["LIGHT_CREAM"])
+            for i, line in enumerate(lines):
+                text = self._performance_font.render(line, True, self._colors["BLACK"])
+                surface.blit(text, (10, 8 + 22 * i))
+            self._performance_surface = surface
+            self._performance_time = now
+
+        position = (self._width - self._performance_surface.get_width() - 10, 10)
+        rects.append(self._screen.blit(self._performance_surface, position))
+
+    # Render text through the surface cache, only re-rendering strings not seen recently
+    def _render_text(self, text, antialias, color):
+        key = (text, antialias, tuple(color))
+        if key in self._text_cache:
+            self._text_hits += 1
+            self._text_cache.move_to_end(key)
+            return self._text_cache[key]
+        self._text_misses += 1
+
+        self._text_cache[key] = self._font.render(text, antialias, color)
+        if len(self._text_cache) > self._text_cache_size:
+            self._text_cache.popitem(last=False)
+        return self._text_cache[key]
+
+    # Report text cache hits, misses and size
+    def text_cache_info(self):
+        return {
+            "hits": self._text_hits,
+            "misses": self._text_misses,
+            "size": len(self._text_cache),
+            "max_size": self._text_cache_size,
+        }
 
     # Handle events such as button clicks and updates
     def handle_events(self, event):
@@ -426,33 +1841,57 @@ class SimulatorGUI:
             pygame.quit()
             sys.exit()
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            if self._back_button_rect.collidepoint(event.pos):
+            mouse_pos = self.to_logical(event.pos)
+            if self._back_button_rect.collidepoint(mouse_pos):
                 self._animating = False
-                self._point_index = 0
+                self._elapsed = 0.0
                 return "setup"
-            if self._start_stop_button_rect.collidepoint(event.pos):
+            if self._start_stop_button_rect.collidepoint(mouse_pos):
                 self._animating = not self._animating
-            if self._reset_button_rect.collidepoint(event.pos):
+            if self._reset_button_rect.collidepoint(mouse_pos):
                 self._animating = False
-                self._point_index = 0
+                self._elapsed = 0.0
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.toggle_performance()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_MINUS:
+            self._slow_motion = min(self._slow_motion * 2, 16.0)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_EQUALS:
+            self._slow_motion = max(self._slow_motion / 2, 1.0)
+        elif event.type == pygame.WINDOWSIZECHANGED:
+            self.resize_window()
+        elif event.type == pygame.WINDOWEXPOSED:
+            self.invalidate()
         return None
 
     # Reset the animation
     def reset(self):
         self._animating = False
-        self._point_index = 0
+        self._elapsed = 0.0
 
 
 # Main class to initialize everything and run the main loop
 class ProjectileSimulator:
-    def __init__(self):
+    def __init__(self, idle_timeout=250, headless=False, optimize_theta=False):
+        # Headless runs draw into the SDL dummy video driver, without opening a window
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         pygame.display.set_caption("Projectile Simulator")
         self._state = "setup"  # Initial state of the simulator
 
         # Screen dimensions and setup
         self._width, self._height = 1600, 900
-        self._screen = pygame.display.set_mode((self._width, self._height))
+        # Launch point on the simulation screen
+        self._origin = (300, self._height - 230)
+        # The layout is drawn at 1600x900 logical pixels off screen and scaled into the resizable window
+        flags = 0 if headless else pygame.RESIZABLE
+        self._window = pygame.display.set_mode((self._width, self._height), flags)
+        self._screen = (
+            self._window
+            if headless
+            else pygame.Surface((self._width, self._height), 0, self._window)
+        )
+        self._assets = AssetManager()  # Images in the display format
 
         # Color definitions
         self._colors = {
@@ -479,6 +1918,9 @@ class ProjectileSimulator:
             self._triangle._vertex1[1] + self._circle_radius
         )
         self._triangle_h = self._triangle._triangle_height
+        self._triangle.valid_centre_raster(
+            self._circle_radius
+        )  # Built once per geometry
 
         # Projectile physics parameters
         self._g = 9.81  # Gravity
@@ -487,6 +1929,9 @@ class ProjectileSimulator:
         self._wall_x = 1.00  # Wall x position
         self._wall_y = 0.60  # Wall height
         self._theta = 45  # Launch angle
+        # Pick theta for the lowest voltage on "Calculate"
+        self._optimize_theta = optimize_theta
+        self._theta_band = None  # Feasible theta range found by the last optimization
 
         self._target_y = 0.755 + 0.07  # Target y position
         self._target_z = 25  # Target z position in cm
@@ -494,6 +1939,8 @@ class ProjectileSimulator:
         self._projectile = Projectile(
             self._g, self._h, self._target_x, self._wall_x, self._wall_y
         )
+        # Firing table for "Calculate", opened lazily on the first lookup
+        self._firing_table = FiringTable(self._projectile)
         self._v0_optimized = self._projectile.optimize_v0(self._theta, self._target_y)
         self._voltage_optimized = self._projectile.voltage_require(self._v0_optimized)
 
@@ -501,6 +1948,13 @@ class ProjectileSimulator:
         self._x_trajectory, self._y_trajectory = self._projectile.trajectory(
             self._v0_optimized, self._theta
         )
+        self._x_polyline, self._y_polyline = self._projectile.adaptive_trajectory(
+            self._v0_optimized, self._theta
+        )
+        self._solution = None  # Last solution the polyline was built for
+        self._line_points = None  # Screen-space trajectory line for the solution
+        self._overlay_mode = None  # Trajectory family shown over the solution
+        self._flight_time = 0.0  # Flight time animated by the ball (s)
 
         # Initialize GUI manager and text entry elements
         self._manager = pygame_gui.UIManager((self._width, self._height))
@@ -520,15 +1974,154 @@ class ProjectileSimulator:
             self._height,
             self._colors,
             self._font,
+            dirty_rects=True,
+            assets=self._assets,
+            window=self._window,
         )
-        
+
         self._errorr = False
+        self._snap = None  # Nearest valid (Y, Z) in mm offered after an invalid entry
+        self._error_message = "Target out of triangle"  # Shown while _errorr is set
 
         self._clock = pygame.time.Clock()  # Clock for managing frame rate
 
+        # Idle-aware loop: block for events (ms) when nothing moves, None keeps a steady 60 fps
+        self._idle_timeout = idle_timeout
+        self._last_input = 0  # Ticks (ms) of the last input event
+
+    # Wait for the next frame and return its time step (s) and events
+    def next_frame(self, animating=False):
+        input_active = pygame.time.get_ticks() - self._last_input < 500
+        if self._idle_timeout is None or animating or input_active:
+            time_delta = self._clock.tick(60) / 1000.0
+            events = pygame.event.get()
+        else:
+            # Idle: sleep until an event arrives, waking up now and then for the cursor blink
+            event = pygame.event.wait(self._idle_timeout)
+            time_delta = self._clock.tick() / 1000.0
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events += pygame.event.get()
+        if events:
+            self._last_input = pygame.time.get_ticks()
+        return time_delta, events
+
+    # Calculate the firing solution for the current target (cached, firing table first)
+    def calculate(self):
+        solution = self._projectile.solution(
+            self._theta, self._target_y, self._firing_table
+        )
+        # Cache hits return the same tuple, so the polyline only changes with the solution
+        if solution is self._solution:
+            return
+        self._solution = solution
+        (
+            self._v0_optimized,
+            self._voltage_optimized,
+            self._x_trajectory,
+            self._y_trajectory,
+        ) = solution
+        self._x_polyline, self._y_polyline = self._projectile.adaptive_trajectory(
+            self._v0_optimized, self._theta
+        )
+
+        self._flight_time = self._projectile.flight_time(
+            self._v0_optimized, self._theta
+        )
+
+        # Screen-space points for the drawn line, kept with the solution
+        origin_x, origin_y = self._origin
+        self._line_points = self._gui.screen_points(
+            origin_x, origin_y, self._x_polyline, self._y_polyline
+        )
+        self.update_overlay()
+
+    # Launch parameters of the overlay family: every feasible theta, or the launcher's noise
+    def overlay_family(
+        self, mode, theta_step=0.25, samples=300, sigma_v0=0.05, sigma_theta=0.5
+    ):
+        if mode == "thetas":
+            thetas = np.arange(1.0, 89.0, theta_step)
+            v0s, _, _, feasible = self._projectile.solve_batch(thetas, self._target_y)
+            return v0s[feasible], thetas[feasible]
+        if mode == "spread":
+            # Fixed seed so the spread does not flicker when the layer is rebuilt
+            rng = np.random.default_rng(0)
+            v0s = self._v0_optimized + sigma_v0 * rng.standard_normal(samples)
+            thetas = self._theta + sigma_theta * rng.standard_normal(samples)
+            return v0s, thetas
+        raise ValueError(f"Unknown overlay mode: {mode}")
+
+    # Rebuild the overlay layer for the current solution and overlay mode
+    def update_overlay(self):
+        if self._overlay_mode is None:
+            self._gui.clear_overlay()
+            return
+        v0s, thetas = self.overlay_family(self._overlay_mode)
+        x, y = self._projectile.trajectory_family(v0s, thetas, num_points=2000)
+        color = self._colors["BLUE" if self._overlay_mode == "thetas" else "RED"]
+        self._gui.set_overlay(self._origin[0], self._origin[1], x, y, color)
+
+    # Cycle the overlay between off, feasible thetas and the launch spread
+    def toggle_overlay(self):
+        modes = [None, "thetas", "spread"]
+        self._overlay_mode = modes[(modes.index(self._overlay_mode) + 1) % len(modes)]
+        self.update_overlay()
+
+    # Nearest valid target, as (Y, Z) in mm, for an invalid circle centre on screen
+    def snap_target(self, cz, cy):
+        # One extra pixel keeps the centre valid after rounding to whole millimetres
+        nearest = self._triangle.nearest_valid_centre(cz, cy, self._circle_radius + 1)
+        if nearest is None:
+            return None
+        temp_y = int(round(self._height - self._triangle._vertical_margin - nearest[1]))
+        temp_z = int(round(nearest[0] - int(self._triangle._horizontal_margin)))
+        return temp_y, temp_z
+
+    # Move the target to the offered snap position
+    def apply_snap(self):
+        self.set_target(*self._snap)
+        self._errorr = False
+        self._snap = None
+
+    # Move the target to (Y, Z) in mm, as typed on the setup screen
+    def set_target(self, temp_y, temp_z):
+        circle_y = self._height - self._triangle._vertical_margin - temp_y
+        circle_z = int(self._triangle._horizontal_margin) + temp_z
+        if not self._triangle.circle_fits(circle_z, circle_y, self._circle_radius):
+            raise ValueError(f"Target Y {temp_y} mm, Z {temp_z} mm is out of triangle")
+        self._circle_y = circle_y
+        self._circle_z = circle_z
+        self._target_y = (temp_y / 1000) + 0.755
+        self._target_z = temp_z / 10
+        self._y_text_entry.set_text(str(temp_y))
+        self._z_text_entry.set_text(str(temp_z))
+
+    # Draw one simulation frame for the current solution, with the ball at (x, y) meters
+    def draw_simulation(self, ball=None):
+        self._gui.draw_simulation(
+            self._origin[0],
+            self._origin[1],
+            self._target_x,
+            self._target_y,
+            self._target_z,
+            self._wall_x,
+            self._wall_y,
+            self._v0_optimized,
+            self._voltage_optimized,
+            self._x_trajectory,
+            self._y_trajectory,
+            self._triangle_h,
+            (self._x_polyline, self._y_polyline),
+            self._line_points,
+            ball,
+            self._theta,
+            self._theta_band,
+        )
+
     # Run the setup loop
     def run_setup(self):
         setup_running = True
+        monitor = self._gui.monitor  # Timing hooks for the performance overlay
         
         # debug
         self._target_y = 0.755 + 0.07  # Target y position
@@ -541,17 +2134,46 @@ class ProjectileSimulator:
         self._circle_z = test_z
         
         while setup_running and self._state == "setup":
-            time_delta = self._clock.tick(60) / 1000.0
-            for event in pygame.event.get():
+            time_delta, events = self.next_frame()
+            start = monitor.start()
+            for event in events:
                 # print(self._target_y)
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
                 elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self._errorr == False:
                     button_rect = pygame.Rect(50, 790, 200, 50)
-                    if button_rect.collidepoint(event.pos):
-                        self._state = "play"
-                        setup_running = False
+                    if button_rect.collidepoint(self._gui.to_logical(event.pos)):
+                        solver_start = monitor.start()
+                        try:
+                            if self._optimize_theta:
+                                self._theta, _, _, self._theta_band = (
+                                    self._projectile.optimize_theta_v0(self._target_y)
+                                )
+                            self.calculate()
+                        except ValueError:
+                            # Unreachable or wall-blocked target: stay on the setup screen
+                            self._errorr = True
+                            self._error_message = "No firing solution"
+                        else:
+                            self._state = "play"
+                            setup_running = False
+                        monitor.stop("solver", solver_start)
+                elif event.type == pygame.WINDOWSIZECHANGED:
+                    self._gui.resize_window()
+                elif event.type == pygame.WINDOWEXPOSED:
+                    self._gui.invalidate()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self._gui.toggle_performance()
+                elif (
+                    event.type == pygame.MOUSEBUTTONDOWN
+                    and event.button == 1
+                    and self._snap is not None
+                    and self._gui._snap_button_rect.collidepoint(
+                        self._gui.to_logical(event.pos)
+                    )
+                ):
+                    self.apply_snap()
 
                 if event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED:
                     if event.ui_element == self._y_text_entry:
@@ -560,19 +2182,17 @@ class ProjectileSimulator:
                             test_y = (
                                 self._height - self._triangle._vertical_margin - temp_y
                             )
-                            self._target_y = (temp_y / 1000) + 0.755
-                            if self._triangle.circle_in_triangle(
-                                self._circle_z,
-                                test_y,
-                                self._circle_radius,
-                                self._triangle._vertex1,
-                                self._triangle._vertex2,
-                                self._triangle._vertex3,
+                            if self._triangle.circle_fits(
+                                self._circle_z, test_y, self._circle_radius
                             ):
                                 self._circle_y = test_y
+                                self._target_y = (temp_y / 1000) + 0.755
                                 self._errorr = False
+                                self._snap = None
                             else:
                                 self._errorr = True
+                                self._error_message = "Target out of triangle"
+                                self._snap = self.snap_target(self._circle_z, test_y)
                         except ValueError:
                             self._y_text_entry.set_text(
                                 str(
@@ -587,19 +2207,17 @@ class ProjectileSimulator:
                         try:
                             temp_z = int(self._z_text_entry.get_text())
                             test_z = int(self._triangle._horizontal_margin) + temp_z
-                            self._target_z = temp_z / 10
-                            if self._triangle.circle_in_triangle(
-                                test_z,
-                                self._circle_y,
-                                self._circle_radius,
-                                self._triangle._vertex1,
-                                self._triangle._vertex2,
-                                self._triangle._vertex3,
+                            if self._triangle.circle_fits(
+                                test_z, self._circle_y, self._circle_radius
                             ):
                                 self._circle_z = test_z
+                                self._target_z = temp_z / 10
                                 self._errorr = False
+                                self._snap = None
                             else:
                                 self._errorr = True
+                                self._error_message = "Target out of triangle"
+                                self._snap = self.snap_target(test_z, self._circle_y)
                         except ValueError:
                             self._z_text_entry.set_text(
                                 str(
@@ -611,8 +2229,11 @@ class ProjectileSimulator:
                             )
 
                 self._manager.process_events(event)
+            monitor.stop("events", start)
 
+            start = monitor.start()
             self._manager.update(time_delta)
+            monitor.stop("manager", start)
             self._gui.draw_setup(
                 self._triangle,
                 self._circle_z,
@@ -623,40 +2244,42 @@ class ProjectileSimulator:
                 self._target_y,
                 self._target_z,
                 self._errorr,
+                self._snap,
+                self._error_message,
             )
 
     # Run the simulation loop
     def run_simulation(self):
+        monitor = self._gui.monitor  # Timing hooks for the performance overlay
         while self._state == "play":
-            self._gui.draw_simulation(
-                300,
-                self._height - 230,
-                self._target_x,
-                self._target_y,
-                self._target_z,
-                self._wall_x,
-                self._wall_y,
-                self._v0_optimized,
-                self._voltage_optimized,
-                self._x_trajectory,
-                self._y_trajectory,
-                self._triangle_h,
-            )
-            for event in pygame.event.get():
+            # Move the ball by the real time since the last frame
+            time_delta, events = self.next_frame(self._gui._animating)
+            self._gui.advance(time_delta, self._flight_time)
+            ball = None
+            if self._gui.ball_visible():
+                start = monitor.start()
+                ball = self._projectile.position(
+                    self._v0_optimized, self._theta, self._gui._elapsed
+                )
+                monitor.stop("solver", start)
+
+            self.draw_simulation(ball)
+            start = monitor.start()
+            for event in events:
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_o:
+                    self.toggle_overlay()
                 new_state = self._gui.handle_events(event)
                 if new_state:
                     self._state = new_state
-                self._v0_optimized = self._projectile.optimize_v0(
-                    self._theta, self._target_y
-                )
-                self._voltage_optimized = self._projectile.voltage_require(
-                    self._v0_optimized
-                )
-                self._x_trajectory, self._y_trajectory = self._projectile.trajectory(
-                    self._v0_optimized, self._theta
-                )
+                solver_start = monitor.start()
+                self.calculate()
+                monitor.stop("solver", solver_start)
                 self._manager.process_events(event)
-            self._manager.update(self._clock.tick(60) / 1000.0)
+            monitor.stop("events", start)
+
+            start = monitor.start()
+            self._manager.update(time_delta)
+            monitor.stop("manager", start)
 
     # Main loop to switch between setup and simulation
     def run(self):
@@ -668,4 +2291,5 @@ class ProjectileSimulator:
 
 
 if __name__ == "__main__":
-    ProjectileSimulator().run()
+    # python Final_Simulator_Real.py [--optimize-theta]
+    ProjectileSimulator(optimize_theta="--optimize-theta" in sys.argv[1:]).run()
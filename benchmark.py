@@ -0,0 +1,403 @@
+import gc
+import os
+import threading
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+import pygame
+
+from Final_Simulator_Real import (
+    AssetManager,
+    DragProjectile,
+    PerformanceMonitor,
+    Projectile,
+    ProjectileSimulator,
+    Triangle,
+)
+
+# Constants (same setup as ProjectileSimulator)
+g = 9.81  # m/s^2, acceleration due to gravity
+h = 0.32936  # initial height (meters)
+target_x = 2.00  # meters
+wall_x = 1.00  # meters
+wall_y = 0.60  # meters
+theta = 45  # degrees
+target_y = 0.755 + 0.07  # meters
+
+
+# Time a callable and return the mean seconds per call
+def time_call(func, number):
+    return timeit.timeit(func, number=number) / number
+
+
+# Compare the closed-form v0 solver against the SLSQP fallback
+def bench_optimize_v0():
+    projectile = Projectile(g, h, target_x, wall_x, wall_y)
+
+    v0_slsqp = projectile.optimize_v0(theta, target_y, method="slsqp")
+    v0_analytic = projectile.optimize_v0(theta, target_y, method="analytic")
+    _, y_slsqp = projectile.projectile_motion(v0_slsqp, theta)
+    _, y_analytic = projectile.projectile_motion(v0_analytic, theta)
+
+    t_slsqp = time_call(
+        lambda: projectile.optimize_v0(theta, target_y, method="slsqp"), 200
+    )
+    t_analytic = time_call(
+        lambda: projectile.optimize_v0(theta, target_y, method="analytic"), 20000
+    )
+
+    print("optimize_v0")
+    print(f"  slsqp:    {t_slsqp * 1e6:10.2f} us  v0={v0_slsqp:.10f}  miss={abs(y_slsqp - target_y):.2e} m")
+    print(f"  analytic: {t_analytic * 1e6:10.2f} us  v0={v0_analytic:.10f}  miss={abs(y_analytic - target_y):.2e} m")
+    print(f"  speedup:  {t_slsqp / t_analytic:10.1f}x")
+
+
+# Compare a scalar optimize_v0 loop against solve_batch over every setup-screen millimetre
+def bench_solve_batch():
+    projectile = Projectile(g, h, target_x, wall_x, wall_y)
+
+    # Every (Y, Z) position in millimetres, only Y changes the firing solution
+    y_mm, _ = np.meshgrid(np.arange(0, 434), np.arange(0, 501), indexing="ij")
+    target_ys = (y_mm.ravel() / 1000) + 0.755
+    thetas = np.full_like(target_ys, theta)
+
+    sample = target_ys[:2000]
+    t_loop = time_call(
+        lambda: [projectile.optimize_v0(theta, y) for y in sample], 3
+    ) / len(sample)
+    t_batch = time_call(lambda: projectile.solve_batch(thetas, target_ys), 10) / len(
+        target_ys
+    )
+
+    v0, _, _, feasible = projectile.solve_batch(thetas, target_ys)
+    print(f"solve_batch ({len(target_ys)} targets, {feasible.sum()} feasible)")
+    print(f"  scalar loop: {t_loop * 1e9:10.1f} ns/target")
+    print(f"  batch:       {t_batch * 1e9:10.1f} ns/target")
+    print(f"  speedup:     {t_loop / t_batch:10.1f}x")
+    v0_loop = np.array([projectile.optimize_v0(theta, y) for y in sample])
+    print(f"  max |v0 - optimize_v0|: {np.max(np.abs(v0[: len(sample)] - v0_loop)):.2e}")
+
+
+# Compare recomputing the solution per event against the Projectile solution cache
+def bench_solution_cache():
+    projectile = Projectile(g, h, target_x, wall_x, wall_y)
+
+    # A flood of mouse-motion events that all ask for the same target
+    def recompute():
+        v0 = projectile.optimize_v0(theta, target_y)
+        projectile.voltage_require(v0)
+        projectile.trajectory(v0, theta)
+
+    t_recompute = time_call(recompute, 5000)
+    t_cached = time_call(lambda: projectile.solution(theta, target_y), 5000)
+
+    print("solution cache (repeated target)")
+    print(f"  recompute: {t_recompute * 1e6:10.2f} us/event")
+    print(f"  cached:    {t_cached * 1e6:10.2f} us/event  {projectile.cache_info()}")
+    print(f"  speedup:   {t_recompute / t_cached:10.1f}x")
+
+
+# Compare integrating shooting candidates one at a time against one batched RK4 call
+def bench_drag_shooting():
+    projectile = DragProjectile(g, h, target_x, wall_x, wall_y)
+    speeds = np.linspace(1, 30, 32)
+
+    t_loop = time_call(
+        lambda: [projectile.heights_at(v, theta, [target_x]) for v in speeds], 5
+    )
+    t_batch = time_call(lambda: projectile.heights_at(speeds, theta, [target_x]), 5)
+    t_solve = time_call(lambda: projectile.optimize_v0(theta, target_y), 5)
+
+    v0 = projectile.optimize_v0(theta, target_y)
+    _, y = projectile.projectile_motion(v0, theta)
+    print("drag RK4 (32 candidate speeds)")
+    print(f"  one at a time: {t_loop * 1e3:10.2f} ms")
+    print(f"  batched:       {t_batch * 1e3:10.2f} ms")
+    print(f"  speedup:       {t_loop / t_batch:10.1f}x")
+    print(f"  shooting solve: {t_solve * 1e3:9.2f} ms  v0={v0:.6f}  miss={abs(y - target_y):.2e} m")
+
+
+# Compare converting and drawing the dense trajectory against the adaptive polyline
+def bench_trajectory_polyline():
+    projectile = Projectile(g, h, target_x, wall_x, wall_y)
+    surface = pygame.Surface((1600, 900))
+    origin_x, origin_y, scale = 300, 670, 460
+    v0 = projectile.optimize_v0(theta, target_y)
+    x_dense, y_dense = projectile.trajectory(v0, theta)
+    x_line, y_line = projectile.adaptive_trajectory(v0, theta, scale=scale)
+
+    # The per-frame list comprehension draw_simulation used before
+    def draw_dense():
+        points = [
+            (origin_x + scale * x, origin_y - scale * y)
+            for x, y in zip(x_dense, y_dense)
+            if y >= 0
+        ]
+        pygame.draw.lines(surface, (217, 217, 217), False, points, 2)
+
+    def draw_adaptive():
+        above_ground = y_line >= 0
+        points = np.column_stack(
+            (origin_x + scale * x_line[above_ground], origin_y - scale * y_line[above_ground])
+        )
+        pygame.draw.lines(surface, (217, 217, 217), False, points.tolist(), 2)
+
+    t_dense = time_call(draw_dense, 500)
+    t_adaptive = time_call(draw_adaptive, 500)
+    error = scale * np.max(np.abs(np.interp(x_dense, x_line, y_line) - y_dense))
+    print(f"trajectory polyline ({len(x_dense)} -> {len(x_line)} vertices, max error {error:.2f} px)")
+    print(f"  dense:    {t_dense * 1e6:10.2f} us/frame")
+    print(f"  adaptive: {t_adaptive * 1e6:10.2f} us/frame")
+    print(f"  speedup:  {t_dense / t_adaptive:10.1f}x")
+
+
+# Compare allocating trajectories against in-place ones over 10 s of frames at 60 fps
+def bench_trajectory_buffers():
+    projectile = Projectile(g, h, target_x, wall_x, wall_y)
+    v0 = projectile.optimize_v0(theta, target_y)
+    frames = 600
+    buffers64 = projectile.trajectory_workspace(1000)
+    buffers32 = projectile.trajectory_workspace(1000, np.float32)
+
+    # Count garbage collections triggered while the frames run
+    collections = [0]
+
+    def on_gc(phase, info):
+        if phase == "start":
+            collections[0] += 1
+
+    print(f"trajectory buffers ({frames} frames)")
+    for name, out in (("allocating", None), ("out= float64", buffers64), ("out= float32", buffers32)):
+        run = lambda: projectile.trajectory(v0, theta, out=out)
+        run()
+
+        # Bytes allocated by a single call
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        run()
+        allocated = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+
+        collections[0] = 0
+        gc.callbacks.append(on_gc)
+        elapsed = time_call(lambda: [run() for _ in range(frames)], 5) / frames
+        gc.callbacks.remove(on_gc)
+        print(f"  {name:13s} {elapsed * 1e6:8.2f} us/frame  {allocated:7d} B/frame  {collections[0]:3d} gc runs")
+
+
+# Compare the 360-sample circle_in_triangle loop against the exact edge-distance test
+def bench_circle_in_triangle():
+    triangle = Triangle(1600, 900, 500)
+    vertices = (triangle._vertex1, triangle._vertex2, triangle._vertex3)
+    radius = 69
+
+    # Candidate centres over the triangle's bounding box
+    rng = np.random.default_rng(0)
+    cz = rng.uniform(triangle._vertex2[0], triangle._vertex3[0], 2000)
+    cy = rng.uniform(triangle._vertex1[1], triangle._vertex2[1], 2000)
+
+    t_loop = time_call(
+        lambda: [triangle.circle_in_triangle(z, y, radius, *vertices) for z, y in zip(cz, cy)],
+        1,
+    ) / len(cz)
+    t_scalar = time_call(
+        lambda: triangle.circle_in_triangle_exact(cz[0], cy[0], radius, *vertices), 10000
+    )
+    t_array = time_call(
+        lambda: triangle.circle_in_triangle_exact(cz, cy, radius, *vertices), 1000
+    ) / len(cz)
+
+    loop = np.array(
+        [triangle.circle_in_triangle(z, y, radius, *vertices) for z, y in zip(cz, cy)]
+    )
+    exact = triangle.circle_in_triangle_exact(cz, cy, radius, *vertices)
+    print(f"circle_in_triangle ({len(cz)} centres, {np.sum(loop != exact)} disagreements)")
+    print(f"  360-sample loop: {t_loop * 1e6:10.2f} us/centre")
+    print(f"  exact scalar:    {t_scalar * 1e6:10.2f} us/centre")
+    print(f"  exact array:     {t_array * 1e6:10.4f} us/centre")
+    print(f"  speedup:         {t_loop / t_scalar:10.1f}x scalar, {t_loop / t_array:.0f}x array")
+
+
+# Compare point_in_triangle one point at a time against points_in_triangle on an array
+def bench_points_in_triangle():
+    triangle = Triangle(1600, 900, 500)
+    vertices = (triangle._vertex1, triangle._vertex2, triangle._vertex3)
+    rng = np.random.default_rng(0)
+    points = rng.uniform((500, 200), (1100, 700), (1_000_000, 2))
+
+    sample = points[:20000]
+    t_loop = time_call(
+        lambda: [triangle.point_in_triangle(z, y, *vertices) for z, y in sample], 1
+    ) / len(sample)
+    t_array = time_call(lambda: triangle.points_in_triangle(points), 5) / len(points)
+
+    print(f"points_in_triangle ({len(points)} points)")
+    print(f"  scalar loop: {1 / t_loop / 1e6:10.2f} M points/s")
+    print(f"  array:       {1 / t_array / 1e6:10.2f} M points/s")
+    print(f"  speedup:     {t_loop / t_array:10.1f}x")
+
+
+# Compare redrawing the whole simulation screen against blitting the cached background
+def bench_draw_simulation():
+    simulator = ProjectileSimulator(headless=True)
+    simulator.calculate()
+    gui = simulator._gui
+    gui._animating = True
+    ball = simulator._projectile.position(simulator._v0_optimized, simulator._theta, 0.3)
+
+    def draw(line_points=simulator._line_points):
+        gui.draw_simulation(
+            simulator._origin[0],
+            simulator._origin[1],
+            simulator._target_x,
+            simulator._target_y,
+            simulator._target_z,
+            simulator._wall_x,
+            simulator._wall_y,
+            simulator._v0_optimized,
+            simulator._voltage_optimized,
+            simulator._x_trajectory,
+            simulator._y_trajectory,
+            simulator._triangle_h,
+            (simulator._x_polyline, simulator._y_polyline),
+            line_points,
+            ball,
+        )
+
+    def draw_uncached():
+        gui.invalidate_background()
+        draw()
+
+    t_full = time_call(draw_uncached, 200)
+    gui._dirty_rects = False
+    t_convert = time_call(lambda: draw(None), 200)
+    t_cached = time_call(draw, 200)
+    gui._dirty_rects = True
+    t_dirty = time_call(draw, 200)
+    print("draw_simulation")
+    print(f"  full redraw: {t_full * 1e3:10.3f} ms/frame")
+    print(f"  per-frame points: {t_convert * 1e3:5.3f} ms/frame")
+    print(f"  cached:      {t_cached * 1e3:10.3f} ms/frame")
+    print(f"  dirty rects: {t_dirty * 1e3:10.3f} ms/frame")
+    print(f"  speedup:     {t_full / t_cached:10.1f}x cached, {t_full / t_dirty:.1f}x dirty rects")
+    pygame.quit()
+
+
+# Compare rendering every label per frame against the SimulatorGUI text cache
+def bench_text_cache():
+    simulator = ProjectileSimulator(headless=True)
+    gui = simulator._gui
+    black = simulator._colors["BLACK"]
+    labels = ["Go back", "Start/Stop", "Reset", "Optimized v0: 5.1073 m/s", "Voltage configurement: 8.12 V"]
+
+    t_render = time_call(lambda: [simulator._font.render(text, True, black) for text in labels], 2000)
+    t_cached = time_call(lambda: [gui._render_text(text, True, black) for text in labels], 2000)
+    info = gui.text_cache_info()
+    print(f"text cache ({len(labels)} labels/frame)")
+    print(f"  font.render: {t_render * 1e6:10.2f} us/frame")
+    print(f"  cached:      {t_cached * 1e6:10.2f} us/frame  hit rate {info['hits'] / (info['hits'] + info['misses']):.4f}")
+    print(f"  speedup:     {t_render / t_cached:10.1f}x")
+    pygame.quit()
+
+
+# Compare drawing a 300-trajectory spread every frame against blitting the cached overlay layer
+def bench_overlay():
+    simulator = ProjectileSimulator(idle_timeout=None, headless=True)
+    simulator.calculate()
+    gui = simulator._gui
+    origin_x, origin_y = simulator._origin
+    v0s, thetas = simulator.overlay_family("spread")
+    x, y = simulator._projectile.trajectory_family(v0s, thetas, num_points=2000)
+    paths = [gui.screen_points(origin_x, origin_y, xi, yi).tolist() for xi, yi in zip(x, y)]
+    color = simulator._colors["RED"]
+
+    def draw_paths():
+        for path in paths:
+            pygame.draw.lines(gui._screen, color, False, path, 1)
+
+    t_build = time_call(lambda: gui.set_overlay(origin_x, origin_y, x, y, color), 5)
+    t_lines = time_call(draw_paths, 20)
+    t_blit = time_call(
+        lambda: gui._screen.blit(gui._overlay, gui._overlay_rect.topleft, gui._overlay_rect), 200
+    )
+    print(f"trajectory overlay ({len(paths)} trajectories)")
+    print(f"  build layer: {t_build * 1e3:10.3f} ms (once per solution)")
+    print(f"  draw.lines:  {t_lines * 1e3:10.3f} ms/frame")
+    print(f"  layer blit:  {t_blit * 1e3:10.3f} ms/frame")
+    print(f"  speedup:     {t_lines / t_blit:10.1f}x")
+    pygame.quit()
+
+
+# Cost of one start()/stop() timing hook pair with the performance overlay off and on
+def bench_performance_monitor():
+    monitor = PerformanceMonitor()
+    t_off = time_call(lambda: monitor.stop("draw", monitor.start()), 200000)
+    monitor.toggle()
+    t_on = time_call(lambda: monitor.stop("draw", monitor.start()), 200000)
+    print("performance monitor hooks")
+    print(f"  off: {t_off * 1e9:10.1f} ns/phase")
+    print(f"  on:  {t_on * 1e9:10.1f} ns/phase")
+
+
+# Compare blitting the side view as loaded against the AssetManager's display-format copy
+def bench_side_view_blit():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((1600, 900))
+    name = "side_view_2024-05-21_151130-removebg-preview.png"
+    size = ((0.27 * 460 * 536) / 466, 0.27 * 460)
+    raw = pygame.transform.scale(pygame.image.load(os.path.join("data/images", name)), size)
+    assets = AssetManager()
+    converted = assets.scaled(name, size)
+
+    t_raw = time_call(lambda: screen.blit(raw, (100, 500)), 5000)
+    t_converted = time_call(lambda: screen.blit(converted, (100, 500)), 5000)
+    t_lookup = time_call(lambda: assets.scaled(name, size), 50000)
+    print(f"side view blit ({raw.get_width()}x{raw.get_height()})")
+    print(f"  as loaded:      {t_raw * 1e6:10.2f} us")
+    print(f"  display format: {t_converted * 1e6:10.2f} us")
+    print(f"  cached lookup:  {t_lookup * 1e6:10.2f} us")
+    pygame.quit()
+
+
+# Compare the CPU used by an untouched setup screen at a steady 60 fps against the idle-aware loop
+def bench_idle_loop(seconds=3.0):
+    print(f"idle setup screen ({seconds:.0f} s, no input)")
+    for name, idle_timeout in (("steady 60 fps", None), ("idle-aware", 250)):
+        simulator = ProjectileSimulator(idle_timeout=idle_timeout, headless=True)
+        frames = [0]
+        draw_setup = simulator._gui.draw_setup
+
+        def counted(*args):
+            frames[0] += 1
+            draw_setup(*args)
+
+        simulator._gui.draw_setup = counted
+
+        # Leave the setup loop from another thread once the time is up
+        timer = threading.Timer(seconds, setattr, (simulator, "_state", "done"))
+        wall, cpu = time.perf_counter(), time.process_time()
+        timer.start()
+        simulator.run_setup()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        print(f"  {name:13s} {100 * cpu / wall:6.1f}% CPU  {frames[0] / wall:6.1f} frames/s")
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    bench_optimize_v0()
+    bench_solve_batch()
+    bench_solution_cache()
+    bench_drag_shooting()
+    bench_trajectory_polyline()
+    bench_trajectory_buffers()
+    bench_circle_in_triangle()
+    bench_points_in_triangle()
+    bench_draw_simulation()
+    bench_text_cache()
+    bench_overlay()
+    bench_performance_monitor()
+    bench_side_view_blit()
+    bench_idle_loop()
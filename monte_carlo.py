@@ -0,0 +1,99 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Half height of the hoop opening around target_y (meters), as drawn in draw_simulation
+HOOP_HALF_HEIGHT = 0.07
+
+# Projectile rebuilt in each pool worker by _init_worker
+_worker_projectile = None
+
+
+# Simulate one chunk of perturbed shots and return its running totals
+def simulate_chunk(
+    projectile, v0, theta, target_y, sigma_v0, sigma_theta, sigma_h, samples, seed
+):
+    rng = np.random.default_rng(seed)
+    v0s = v0 + sigma_v0 * rng.standard_normal(samples)
+    thetas = theta + sigma_theta * rng.standard_normal(samples)
+    dh = sigma_h * rng.standard_normal(samples)
+
+    # A different launch height shifts the whole trajectory up or down by dh
+    _, y_target = projectile.projectile_motion(v0s, thetas)
+    y_target = y_target + dh
+    y_wall = projectile.y_at_wall(v0s, thetas) + dh
+
+    # Shots that land before the wall (NaN heights) count as wall strikes
+    with np.errstate(invalid="ignore"):
+        clears_wall = y_wall >= projectile._wall_y
+        reached = clears_wall & np.isfinite(y_target)
+        miss = y_target[reached] - target_y
+        hits = np.abs(miss) <= HOOP_HALF_HEIGHT
+
+    return (
+        samples,
+        int(hits.sum()),
+        int(samples - clears_wall.sum()),
+        int(reached.sum()),
+        float(miss.sum()),
+        float((miss**2).sum()),
+    )
+
+
+# Rebuild the projectile once per worker from its class and parameters, without its caches
+def _init_worker(projectile_class, parameters):
+    global _worker_projectile
+    _worker_projectile = projectile_class(*parameters)
+
+
+# Simulate one chunk in a pool worker against the worker's projectile
+def _simulate_worker_chunk(*arguments):
+    return simulate_chunk(_worker_projectile, *arguments)
+
+
+# Estimate the probability that a noisy launcher passes the ball through the hoop
+def hit_probability(
+    projectile,
+    v0,
+    theta,
+    target_y,
+    sigma_v0=0.05,
+    sigma_theta=0.5,
+    sigma_h=0.002,
+    samples=1_000_000,
+    chunk_size=100_000,
+    seed=None,
+    processes=None,
+):
+    # Fixed-size chunks keep memory bounded, each with its own random stream
+    chunk_sizes = [chunk_size] * (samples // chunk_size)
+    if samples % chunk_size:
+        chunk_sizes.append(samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    arguments = [
+        (v0, theta, target_y, sigma_v0, sigma_theta, sigma_h, n, s)
+        for n, s in zip(chunk_sizes, seeds)
+    ]
+
+    # Optional process pool for very large sample counts, the projectile sent once per worker
+    if processes:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(type(projectile), projectile.parameters()),
+        ) as pool:
+            results = list(pool.map(_simulate_worker_chunk, *zip(*arguments)))
+    else:
+        results = [simulate_chunk(projectile, *args) for args in arguments]
+
+    total, hits, wall_strikes, reached, miss_sum, miss_sq_sum = np.sum(
+        results, axis=0
+    )
+    miss_mean = miss_sum / reached if reached else float("nan")
+    miss_var = miss_sq_sum / reached - miss_mean**2 if reached else float("nan")
+    return {
+        "hit_probability": float(hits / total),
+        "wall_strike_rate": float(wall_strikes / total),
+        "landing_mean": float(target_y + miss_mean),
+        "landing_std": float(np.sqrt(max(miss_var, 0.0))),
+        "samples": int(total),
+    }
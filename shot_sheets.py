@@ -0,0 +1,58 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from Final_Simulator_Real import ProjectileSimulator
+
+
+# Encode one raw RGB frame to an image file (runs in a worker process)
+def encode_frame(data, size, path):
+    pygame.image.save(pygame.image.frombytes(data, size, "RGB"), path)
+    return path
+
+
+# Render the simulation screen for every (Y, Z) target in mm to a numbered image sequence
+def render_shot_sheets(
+    targets, directory="shot_sheets", pattern="shot_{:04d}.png", processes=None
+):
+    simulator = ProjectileSimulator(idle_timeout=None, headless=True)
+
+    # Place and solve every target first so a bad entry does not leave a partial sequence
+    for temp_y, temp_z in targets:
+        simulator.set_target(temp_y, temp_z)
+        simulator.calculate()
+    os.makedirs(directory, exist_ok=True)
+
+    # Frames are drawn here while the pool encodes the previous ones
+    workers = processes or os.cpu_count() or 1
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for index, (temp_y, temp_z) in enumerate(targets):
+            simulator.set_target(temp_y, temp_z)
+            simulator.calculate()
+            simulator.draw_simulation()
+
+            screen = simulator._screen
+            data = pygame.image.tobytes(screen, "RGB")
+            path = os.path.join(directory, pattern.format(index))
+            pending.append(pool.submit(encode_frame, data, screen.get_size(), path))
+
+            # Bound the raw frames held in memory to a few per worker
+            if len(pending) >= 2 * workers:
+                paths.append(pending.pop(0).result())
+        paths.extend(future.result() for future in pending)
+
+    pygame.quit()
+    return paths
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python shot_sheets.py OUTPUT_DIR Y,Z [Y,Z ...]   (targets in mm)")
+        sys.exit(1)
+    targets = [tuple(int(v) for v in arg.split(",")) for arg in sys.argv[2:]]
+    for path in render_shot_sheets(targets, sys.argv[1]):
+        print(path)